@@ -0,0 +1,226 @@
+"""
+Load test of pyTelegramBot with the mock Telegram server
+====================================================================================================
+
+Starts the mock Telegram Bot API server of pyTelegramBot (with the given latency and part of the requests
+rate limited) and a bot which polls it, then sends the bot thousands of updates from many chats: commands,
+text inputs of a command and presses of inline keyboard buttons. Every update is answered with one message,
+so the replies are matched with the updates of their chat in order.
+
+Reported for every round: the time to dispatch all the updates and the throughput, the end-to-end latency
+(from the update being added to the server until the reply arrives at it), the statistics of the dispatcher,
+send queue and server, and the memory (RSS) of the process. The memory should stop growing after the first
+round, as the same chats are used again.
+
+Usage: python benchmarks/bench_bot.py [--updates 5000] [--chats 200] [--rounds 3] [--latency 0.005]
+                                      [--rate-limit 0.01] [--workers 4]
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+import os
+import sys
+from argparse import ArgumentParser
+from threading import Thread
+from time import monotonic, sleep, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pyTelegramBot import (  # noqa: E402
+    InlineKeyboardButton,
+    InlineKeyboardInput,
+    MockTelegramServer,
+    TelegramBot,
+)
+
+
+def read_rss():
+    """
+    Returns the resident memory of the process in bytes, or None if it isn't known
+    """
+    try:
+        for line in open("/proc/self/status"):
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Peak
+    except ImportError:
+        return None
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def make_bot(server, args):
+    """
+    Returns a bot connected to the mock server, with a command, a command which accepts a text input and an
+    inline keyboard. Every handler sends exactly one message
+    """
+    bot = TelegramBot(
+        "TEST",
+        api_url=server.api_url,
+        polling_timeout=1,
+        handler_workers=args.workers,
+        global_rate=args.global_rate,
+        chat_rate=args.chat_rate,
+    )
+    menu = InlineKeyboardInput("menu")
+    menu.add_buttons([InlineKeyboardButton(str(i), str(i)) for i in range(3)])
+
+    def menu_pressed(query):
+        query.answer_callback()
+        bot.send_message(query.from_user.id, f"You pressed {query.input_data}")
+
+    menu.set_action_function(menu_pressed)
+    bot.inline_keyboard_inputs[menu.name] = menu
+
+    def save_name(text, message):
+        bot.cancel_text_input(message.from_user.id)
+        bot.send_message(message.chat_id, f"Saved: {text}")
+
+    @bot.on_command(["ping"])
+    def ping(message):
+        bot.send_message(message.chat_id, "pong")
+
+    @bot.on_command(["name"], accept_text_input=save_name)
+    def name(message):
+        bot.send_message(message.chat_id, "What is your name?")
+
+    return bot
+
+
+def push_updates(server, count, chats):
+    """
+    Add the updates of a round to the server and return the times they were added, by chat
+    """
+    pushed = {chat_id: [] for chat_id in range(1000, 1000 + chats)}
+    for i in range(count):
+        chat_id = 1000 + i % chats
+        step = (i // chats) % 4  # Every chat sends the same sequence
+        if step == 0:
+            server.push_command(chat_id, "ping")
+        elif step == 1:
+            server.push_command(chat_id, "name")
+        elif step == 2:
+            server.push_message(chat_id, f"User {chat_id}")
+        else:
+            message = {
+                "message_id": i,
+                "date": int(time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": "Menu",
+            }
+            server.push_callback_query(chat_id, message, f"menu_{i % 3}")
+        pushed[chat_id].append(monotonic())
+    return pushed
+
+
+def run_round(server, args):
+    """
+    Send the updates of a round to the bot, wait for all the replies and return the results
+    """
+    server.clear()  # The memory used by the server isn't counted
+    start = monotonic()
+    pushed = push_updates(server, args.updates, args.chats)
+    deadline = start + args.timeout
+    while (len(server.sent_messages()) < args.updates) and (monotonic() < deadline):
+        sleep(0.05)
+    replies = server.sent_messages()
+    duration = (replies[-1][0] if replies else monotonic()) - start
+
+    by_chat = {}
+    for received, _, payload in replies:
+        by_chat.setdefault(payload["chat_id"], []).append(received)
+    latencies = sorted(
+        reply - update
+        for chat_id, times in pushed.items()
+        for update, reply in zip(times, by_chat.get(chat_id, []))
+    )
+    return {
+        "replies": len(replies),
+        "duration": duration,
+        "latencies": latencies,
+    }
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--updates", type=int, default=5000, help="Updates per round")
+    parser.add_argument("--chats", type=int, default=200, help="Chats sending them")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument(
+        "--latency", type=float, default=0.005, help="Seconds added to every response"
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=0.01,
+        help="Part of the requests answered with a 429 error",
+    )
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=4, help="Handler workers")
+    # Much higher than the limits of Telegram, so the dispatching is measured instead of the rate limits
+    parser.add_argument("--global-rate", type=float, default=10000)
+    parser.add_argument("--chat-rate", type=float, default=1000)
+    parser.add_argument(
+        "--timeout", type=float, default=300, help="Maximum seconds per round"
+    )
+    args = parser.parse_args()
+
+    server = MockTelegramServer(
+        latency=args.latency,
+        rate_limit_probability=args.rate_limit,
+        retry_after=args.retry_after,
+        seed=1,
+    ).start()
+    bot = make_bot(server, args)
+    rss_start = read_rss()
+    Thread(target=bot.start_polling, daemon=True).start()
+    # The first "getUpdates" request skips the old updates, so the updates are added after it
+    while bot.update_offset is None:
+        sleep(0.01)
+
+    print(
+        f"{args.updates} updates from {args.chats} chats per round, {args.latency * 1000:.0f} ms latency, "
+        f"{args.rate_limit:.1%} rate limited, {args.workers} handler workers\n"
+    )
+    for round_number in range(1, args.rounds + 1):
+        result = run_round(server, args)
+        latencies = result["latencies"]
+        rss = read_rss()
+        print(
+            f"Round {round_number}: {result['replies']}/{args.updates} replies in {result['duration']:.2f}s "
+            f"({result['replies'] / result['duration']:.0f} updates/s)"
+        )
+        if latencies:
+            print(
+                f"  End-to-end latency: p50 {percentile(latencies, 0.5) * 1000:.1f} ms, "
+                f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms, "
+                f"max {latencies[-1] * 1000:.1f} ms"
+            )
+        if rss is not None:
+            print(
+                f"  Memory: {rss / 1024 / 1024:.1f} MiB RSS "
+                f"(+{(rss - rss_start) / 1024 / 1024:.1f} MiB since the start)"
+            )
+
+    dispatcher = bot.dispatcher.metrics()
+    print(
+        f"\nDispatcher: {dispatcher['handled']} handled, {dispatcher['failed']} failed, "
+        f"max {dispatcher['max_pending']} pending, {dispatcher['backpressure_waits']} backpressure waits"
+    )
+    print(f"Send queue: {bot.send_queue.stats}")
+    print(
+        f"Server: {server.stats['requests']} requests, {server.stats['rate_limited']} rate limited"
+    )
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
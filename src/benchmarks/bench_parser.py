@@ -0,0 +1,134 @@
+"""
+Benchmark of the parser backends of sections.py
+====================================================================================================
+
+Measures the CPU time and the peak memory used to extract the updates from saved copies of the portal page.
+The memory of every backend is measured in a new process, as the growth of its peak resident memory (RSS)
+while parsing, so the C memory of lxml is counted too.
+Save more pages (for example with "curl -o benchmarks/fixtures/homepage_2.html <URL>") to include them.
+
+Usage: python benchmarks/bench_parser.py [--runs 50] [page.html ...]
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+import os
+import resource
+import subprocess
+import sys
+from argparse import SUPPRESS, ArgumentParser
+from glob import glob
+from json import dumps, loads
+from time import process_time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from portals import PROFILES  # noqa: E402
+from sections import PARSER_BACKENDS, extract_sections  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def measure_cpu(content, profile, backend, runs):
+    start = process_time()
+    for _ in range(runs):
+        extract_sections(content, profile, backend)
+    return (process_time() - start) / runs
+
+
+def _read_status(field):
+    """
+    Internal function which returns a memory field of /proc/self/status in bytes, or None. Don't use.
+    """
+    try:
+        for line in open("/proc/self/status"):
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    """
+    Reset the peak RSS of the process (Linux only). Returns False if it can't be reset
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def read_peak_rss():
+    """
+    Returns the peak resident memory of the process in bytes
+    """
+    peak = _read_status("VmHWM")
+    if peak is not None:
+        return peak
+    # Without /proc, the peak can't be reset and may include the memory of the parent process before exec()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # KiB on Linux
+
+
+def measure_peak_memory(page, profile_name, backend):
+    """
+    Returns the growth of the peak RSS while a new process parses the page, in bytes
+    """
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), page, "--profile", profile_name]
+        + ["--memory-of", backend],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return loads(output)["peak_growth"]
+
+
+def report_memory(page, profile, backend):
+    """
+    Parse the page once and print the growth of the peak RSS (run in a new process by measure_peak_memory())
+    """
+    # The parser libraries are already imported by sections.py
+    content = open(page, "rb").read()
+    before = _read_status("VmRSS") if reset_peak_rss() else read_peak_rss()
+    extract_sections(content, profile, backend)
+    print(dumps({"peak_growth": read_peak_rss() - before}))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("pages", nargs="*", help="Saved HTML pages of the portal")
+    parser.add_argument("--runs", type=int, default=50, help="Runs per backend")
+    parser.add_argument("--profile", default="mahacet", help="Parsing profile")
+    parser.add_argument("--memory-of", help=SUPPRESS)
+    args = parser.parse_args()
+
+    pages = args.pages or sorted(glob(os.path.join(FIXTURES_DIR, "*.html")))
+    profile = PROFILES[args.profile]
+    if args.memory_of:
+        report_memory(pages[0], profile, args.memory_of)
+        return
+    for page in pages:
+        content = open(page, "rb").read()
+        print(f"{os.path.basename(page)} ({len(content) / 1024:.1f} KiB)")
+
+        expected = extract_sections(content, profile, "html.parser")
+        baseline = measure_cpu(content, profile, "html.parser", args.runs)
+        for backend in PARSER_BACKENDS:
+            if extract_sections(content, profile, backend) != expected:
+                print(f"  {backend:<12} gives a different result than html.parser!")
+                continue
+            cpu = measure_cpu(content, profile, backend, args.runs)
+            peak = measure_peak_memory(page, args.profile, backend)
+            print(
+                f"  {backend:<12} {cpu * 1000:8.2f} ms CPU ({baseline / cpu:5.1f}x)"
+                f"   {peak / 1024:8.1f} KiB peak RSS growth"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Benchmark of the poll cycle of main.py (scrape -> diff -> notify)
+====================================================================================================
+
+Runs the stages of a poll on the saved copies of the portal page (benchmarks/fixtures) with synthetic
+histories of increasing size, without the network (the portal client is replaced by a stub which returns
+the saved page) and without Google (the synthesis engine is replaced by a stub which returns silent MP3 data).
+
+The stages are:
+
+- "load": Reading the history when the program starts
+- "fetch_parse": get_updates_from_website(), i.e., checking the hash of the page, parsing it building its snapshot and saving the latest updates
+- "index": Building the fingerprint index of the history (once per program run)
+- "diff": get_unique_updates() on a page whose updates are all in the history except a few new ones
+- "flush": Writing the changed history to the disk
+- "tts_cold" and "tts_warm": create_txt_to_speech_message() with an empty cache and with the template clips cached
+
+For every stage, the median and maximum latency, the peak memory allocated by Python (tracemalloc) and the
+bytes read and written by the process (from /proc/self/io, Linux and Android only) are reported. The results
+can be saved as a baseline and the later runs are compared with it, failing (exit code 1) on regressions.
+The 100k history takes a few minutes, mostly to build its fingerprint index (whose allocations aren't
+traced, see measure()).
+
+Usage: python benchmarks/bench_pipeline.py [--sizes 10 100 1000 10000 100000] [--runs 5] [--backend json]
+                                           [--save-baseline] [--tolerance 1.5]
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+import io
+import os
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from glob import glob
+from itertools import count
+from json import dumps, loads
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCHMARKS_DIR, "fixtures")
+BASELINES_DIR = os.path.join(BENCHMARKS_DIR, "baselines")
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, ".."))
+
+from history import open_history_store  # noqa: E402
+from portals import Portal  # noqa: E402
+from tts import ClipCache, SpeechSynthesizer, SynthesisEngine  # noqa: E402
+
+NEW_UPDATES_PER_POLL = 3  # Updates of the "diff" stage which aren't in the history
+# Differences smaller than these are noise, not regressions
+MIN_LATENCY_REGRESSION = 0.001
+MIN_MEMORY_REGRESSION = 64 * 1024
+MAX_TRACED_LATENCY = 5  # Seconds
+
+
+def read_process_io():
+    """
+    Returns the number of bytes read and written by the process so far, or (0, 0) if it isn't known
+    """
+    try:
+        counters = dict(
+            line.split(": ") for line in open("/proc/self/io").read().splitlines()
+        )
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+
+def measure(stage, setup=None, runs=5):
+    """
+    Returns the latency, allocation and I/O statistics of a stage. The allocations of the stages slower than
+    MAX_TRACED_LATENCY aren't measured (None), as tracemalloc makes them many times slower
+    :param stage: Function which runs the stage with the arguments returned by setup
+    :param setup: Function which prepares a run (not measured) and returns the arguments of the stage
+    :param runs: Number of timed runs
+    """
+    setup = setup or (lambda: ())
+    times = []
+    for _ in range(runs):
+        args = setup()
+        read_before, written_before = read_process_io()
+        start = perf_counter()
+        stage(*args)
+        times.append(perf_counter() - start)
+        read_after, written_after = read_process_io()
+
+    peak = None
+    if median(times) <= MAX_TRACED_LATENCY:
+        args = setup()
+        tracemalloc.start()
+        stage(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {
+        "latency": median(times),
+        "max_latency": max(times),
+        "peak_alloc": peak,
+        "io_read": read_after - read_before,
+        "io_write": written_after - written_before,
+    }
+
+
+def make_history(page_updates, size, portal):
+    """
+    Returns a history which contains all the updates of the page and "size" other synthetic updates
+    """
+    history = {
+        portal.history_key(name): list(messages)
+        for name, messages in page_updates.items()
+    }
+    categories = portal.profile["cards"]
+    for i in range(size):
+        key = portal.history_key(categories[i % len(categories)])
+        history[key].append(
+            f"Notice {i}: Provisional merit list of CAP Round {i % 4 + 1} for the candidates of batch {i // 7} is published"
+        )
+    return history
+
+
+class StubEngine(SynthesisEngine):
+    name = "stub"
+
+    def synthesize(self, text, lang):
+        # A silent MPEG-1 Layer III frame (32 kbps, 44.1 kHz) for about every word
+        frame = bytes([0xFF, 0xFB, 0x10, 0x00]) + bytes(100)
+        return frame * max(1, len(text) // 6)
+
+
+def run_benchmarks(main, sizes, runs, backend):
+    """
+    Returns the results of all the stages as {"stage@size": stats}
+    """
+    portal = Portal(name="bench", url="https://example.com", title="Bench")
+    pages = [open(path, "rb").read() for path in sorted(glob(f"{FIXTURES_DIR}/*.html"))]
+
+    class Response:
+        status_code = 200
+
+        def __init__(self, content):
+            self.content = content
+            self.headers = {"etag": str(hash(content))}
+
+        def raise_for_status(self):
+            pass
+
+    page_index = [0]
+
+    def fetch(url, headers=None):
+        page_index[0] = (page_index[0] + 1) % len(pages)
+        return Response(pages[page_index[0]])
+
+    main.portal_client.get = fetch
+    main.latest_updates = open_history_store("json", "updates.json", "latest_updates")
+    results = {}
+    silent = io.StringIO()  # The stages print their logs
+
+    def fetch_parse():
+        portal.body_hash = None  # The page must be parsed on every run
+        portal.etag = portal.last_modified = None
+        return (portal,)
+
+    with redirect_stdout(silent):
+        results["fetch_parse@-"] = measure(
+            main.get_updates_from_website, fetch_parse, runs
+        )
+        page_updates = main.get_updates_from_website(fetch_parse()[0]).texts()
+
+    for size in sizes:
+        with open("last_checked.json", "w") as file:
+            file.write(dumps(make_history(page_updates, size, portal)))
+        if backend == "sqlite":
+            for path in glob("history.db*"):
+                os.remove(path)
+            open_history_store(backend, "last_checked.json", "history").close()
+
+        stores = []
+        results[f"load@{size}"] = measure(
+            lambda: stores.append(
+                open_history_store(backend, "last_checked.json", "history", 3600)
+            ),
+            runs=runs,
+        )
+        for store in stores[:-1]:
+            store.close()
+        main.history = stores[-1]
+
+        def build_index():
+            main.fingerprint_indexes.clear()
+            main.get_fingerprint_index(portal)
+
+        results[f"index@{size}"] = measure(build_index, runs=1)
+
+        poll = [0]
+
+        def diff_setup():
+            poll[0] += 1
+            website_updates = {name: list(m) for name, m in page_updates.items()}
+            for k in range(NEW_UPDATES_PER_POLL):
+                website_updates[portal.profile["cards"][0]].append(
+                    f"New notice {size}-{poll[0]}-{k}: Schedule of CAP Round {poll[0]} is published"
+                )
+            return portal, website_updates
+
+        with redirect_stdout(silent):
+            results[f"diff@{size}"] = measure(main.get_unique_updates, diff_setup, runs)
+
+        def flush_setup():
+            poll[0] += 1
+            # Something must have changed
+            main.history.add(portal.history_key("News"), f"Flush {size}-{poll[0]}")
+            return ()
+
+        results[f"flush@{size}"] = measure(main.history.flush, flush_setup, runs)
+        main.history.close()
+
+    segments = main.get_speech_segments(
+        portal, "News", "Provisional Allotment of CAP Round I is published"
+    )
+
+    warm_synthesizer = SpeechSynthesizer([StubEngine()], ClipCache("tts_cache_warm"))
+    warm_synthesizer.prepare_clips([segments[0], segments[2]])  # The template clips
+    cold_caches = count()
+
+    def tts_cold():
+        main.synthesizer = SpeechSynthesizer(
+            [StubEngine()], ClipCache(f"tts_cache_{next(cold_caches)}")
+        )
+        return segments, "output_bench"
+
+    def tts_warm():
+        main.synthesizer = warm_synthesizer
+        return segments, "output_bench"
+
+    with redirect_stdout(silent):
+        results["tts_cold@-"] = measure(
+            main.create_txt_to_speech_message, tts_cold, runs
+        )
+        results["tts_warm@-"] = measure(
+            main.create_txt_to_speech_message, tts_warm, runs
+        )
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns the list of the regressions of the results compared to the baseline
+    """
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if (stats["latency"] > base["latency"] * tolerance) and (
+            stats["latency"] - base["latency"] > MIN_LATENCY_REGRESSION
+        ):
+            regressions.append(
+                f"{name}: latency {base['latency'] * 1000:.2f} ms -> {stats['latency'] * 1000:.2f} ms"
+            )
+        if (stats["peak_alloc"] is None) or (base["peak_alloc"] is None):
+            continue
+        if (stats["peak_alloc"] > base["peak_alloc"] * tolerance) and (
+            stats["peak_alloc"] - base["peak_alloc"] > MIN_MEMORY_REGRESSION
+        ):
+            regressions.append(
+                f"{name}: peak allocation {base['peak_alloc'] / 1024:.0f} KiB -> {stats['peak_alloc'] / 1024:.0f} KiB"
+            )
+    return regressions
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="*",
+        default=[10, 100, 1000, 10000, 100000],
+        help="Number of synthetic updates in the history",
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per stage")
+    parser.add_argument("--backend", default="json", choices=["json", "sqlite"])
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Save the results as the baseline"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=1.5,
+        help="A stage regressed if it is this many times slower (or bigger) than the baseline",
+    )
+    args = parser.parse_args()
+    baseline_path = os.path.join(BASELINES_DIR, f"pipeline_{args.backend}.json")
+
+    with TemporaryDirectory() as directory:
+        os.chdir(directory)  # main.py saves its files in the working directory
+        os.environ.setdefault("OWNER_TELEGRAM_ID", "0")
+        import main as program
+
+        results = run_benchmarks(program, args.sizes, args.runs, args.backend)
+        os.chdir(BENCHMARKS_DIR)
+
+    print(
+        f"{'stage':<20} {'median ms':>10} {'max ms':>10} {'peak KiB':>10} {'read KiB':>10} {'write KiB':>10}"
+    )
+    for name, stats in results.items():
+        peak = (
+            "-" if stats["peak_alloc"] is None else f"{stats['peak_alloc'] / 1024:.1f}"
+        )
+        print(
+            f"{name:<20} {stats['latency'] * 1000:10.3f} {stats['max_latency'] * 1000:10.3f} "
+            f"{peak:>10} {stats['io_read'] / 1024:10.1f} {stats['io_write'] / 1024:10.1f}"
+        )
+
+    if args.save_baseline:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        with open(baseline_path, "w") as file:
+            file.write(dumps(results, indent=4))
+        print(f"\nSaved the baseline to '{baseline_path}'")
+        return
+    if not os.path.exists(baseline_path):
+        print("\nNo baseline to compare with, save one with --save-baseline")
+        return
+    regressions = compare(results, loads(open(baseline_path).read()), args.tolerance)
+    if regressions:
+        print("\nRegressions compared to the baseline:")
+        for regression in regressions:
+            print(f"- {regression}")
+        sys.exit(1)
+    print("\nNo regressions compared to the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark of the synthesis engines of tts.py
+====================================================================================================
+
+Measures the time-to-first-audio (the time to synthesize the first part of a voice message, which is when
+the playback could start) and the time to make the whole voice message, for every available engine.
+Every run uses an empty cache, so the engines are really called.
+
+Usage: python benchmarks/bench_tts.py [--runs 3] [--engines gtts espeak]
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+import os
+import sys
+from argparse import ArgumentParser
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from tts import ENGINES, ClipCache, SpeechSynthesizer, get_engines  # noqa: E402
+
+SEGMENTS = [
+    "Hello Siddhesh, there is a new 'News' message from the FE 2025 CET Cell portal, stating that",
+    "Provisional Allotment for CAP Round III has been Published. Check your Allotment Status",
+    "Please visit the official website for more information.",
+]
+
+
+def measure(engine, runs):
+    first_audio = []
+    total = []
+    for _ in range(runs):
+        with TemporaryDirectory() as directory:
+            synthesizer = SpeechSynthesizer([engine], ClipCache(directory))
+            start = perf_counter()
+            synthesizer.prepare_clips(SEGMENTS[:1])
+            first_part = perf_counter() - start
+            synthesizer.create_voice_message(
+                SEGMENTS, os.path.join(directory, "output")
+            )
+            total.append(perf_counter() - start)
+            # Clips which can't be joined are made as a whole message, so the audio starts only at the end
+            first_audio.append(first_part if engine.extension == "mp3" else total[-1])
+    return median(first_audio), median(total)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="Runs per engine")
+    parser.add_argument(
+        "--engines", nargs="*", default=list(ENGINES.keys()), help="Engines to test"
+    )
+    args = parser.parse_args()
+
+    for engine in get_engines(args.engines):
+        if not engine.is_available():
+            print(f"{engine.name:<8} not available on this device")
+            continue
+        try:
+            first_audio, total = measure(engine, args.runs)
+        except Exception as E:
+            print(f"{engine.name:<8} failed: {E}")
+            continue
+        print(
+            f"{engine.name:<8} time-to-first-audio {first_audio * 1000:8.1f} ms"
+            f"   whole message {total * 1000:8.1f} ms   (median of {args.runs} runs)"
+        )
+
+
+if __name__ == "__main__":
+    main()
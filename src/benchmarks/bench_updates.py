@@ -0,0 +1,155 @@
+"""
+Benchmark of the update classes of pyTelegramBot
+====================================================================================================
+
+Measures the memory kept per update and the time to wrap a batch of updates received from "getUpdates"
+and read the fields used while dispatching them (the entities and the text of the messages, the input name
+of the callback queries). The lazy classes of pyTelegramBot are compared with eager classes which decode
+every field (and make the nested objects) when they are created, like the update classes used to.
+The memory is measured with tracemalloc and doesn't include the dictionaries received from the API,
+which are the same for both.
+
+Usage: python benchmarks/bench_updates.py [--updates 10000] [--runs 5]
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+import os
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from json import dumps, loads
+from statistics import median
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pyTelegramBot.pyTelegramBot import CallbackQuery, Message  # noqa: E402
+
+
+class EagerUser:
+    def __init__(self, user_dict, bot_object):
+        self.user_dict = user_dict
+        self.bot_object = bot_object
+        self.id = user_dict["id"]
+        self.is_bot = user_dict.get("is_bot", None)
+        self.first_name = user_dict.get("first_name", "")
+        self.last_name = user_dict.get("last_name", "")
+        self.username = user_dict.get("username", None)
+
+
+class EagerMessage:
+    def __init__(self, message_dict, bot_object):
+        self.message_dict = message_dict
+        self.bot_object = bot_object
+        self.id = message_dict["message_id"]
+        self.date = message_dict["date"]
+        self.text = message_dict["text"]
+        self.entities = message_dict.get("entities", None)
+        self.from_user = EagerUser(message_dict["from"], bot_object)
+        self.chat = message_dict["chat"]
+        self.chat_id = self.chat["id"]
+
+
+class EagerCallbackQuery:
+    def __init__(self, query_dict, bot_object):
+        self.query_dict = query_dict
+        self.bot_object = bot_object
+        self.id = query_dict["id"]
+        self.from_user = EagerUser(query_dict["from"], bot_object)
+        self.message = EagerMessage(query_dict["message"], bot_object)
+        self.data = str(query_dict["data"])
+        self.input_name = self.data.split("_")[0]
+        self.input_data = self.data[self.data.index("_") + 1 :]
+
+
+def make_updates(count):
+    """
+    Returns a list of update dictionaries: commands, text messages and callback queries
+    """
+    updates = []
+    for i in range(count):
+        user = {"id": 1000 + i % 500, "is_bot": False, "first_name": f"User {i}"}
+        chat = {"id": 1000 + i % 500, "type": "private", "first_name": f"User {i}"}
+        message = {
+            "message_id": i,
+            "date": 1750000000 + i,
+            "from": user,
+            "chat": chat,
+            "text": "/subscribe" if i % 3 == 0 else f"News, Downloads {i}",
+        }
+        if i % 3 == 0:
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": 10}]
+        if i % 5 == 4:
+            updates.append(
+                {
+                    "update_id": i,
+                    "callback_query": {
+                        "id": str(i),
+                        "from": user,
+                        "message": message,
+                        "data": f"portals_{i}",
+                    },
+                }
+            )
+        else:
+            updates.append({"update_id": i, "message": message})
+    # Decoded from JSON, like the real responses, so the dictionaries aren't shared
+    return loads(dumps(updates))
+
+
+def wrap(updates, message_class, callback_class):
+    """
+    Make the update objects and read the fields used by the dispatcher
+    """
+    objects = []
+    for update in updates:
+        if "message" in update:
+            message = message_class(update["message"], None)
+            if message.entities is None:
+                message.from_user.id  # Looks for a pending text input of the user
+            else:
+                message.text
+            objects.append(message)
+        else:
+            query = callback_class(update["callback_query"], None)
+            query.input_name
+            objects.append(query)
+    return objects
+
+
+def measure(updates, message_class, callback_class, runs):
+    times = []
+    for _ in range(runs):
+        start = perf_counter()
+        wrap(updates, message_class, callback_class)
+        times.append(perf_counter() - start)
+
+    tracemalloc.start()
+    objects = wrap(updates, message_class, callback_class)
+    kept = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return median(times) / len(updates), kept / len(updates)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--updates", type=int, default=10000, help="Updates per run")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs")
+    args = parser.parse_args()
+
+    updates = make_updates(args.updates)
+    for name, message_class, callback_class in (
+        ("eager", EagerMessage, EagerCallbackQuery),
+        ("lazy", Message, CallbackQuery),
+    ):
+        seconds, memory = measure(updates, message_class, callback_class, args.runs)
+        print(
+            f"{name:<6} {seconds * 1e6:6.2f} us/update   {memory:6.0f} bytes kept/update"
+        )
+
+
+if __name__ == "__main__":
+    main()
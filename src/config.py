@@ -5,4 +5,6 @@ load_dotenv()
 
 
 TELEGRAM_BOT_TOKEN = getenv("TELEGRAM_BOT_TOKEN", "")
+# Can be set to a local Bot API server (or the mock server of pyTelegramBot) for testing
+TELEGRAM_API_URL = getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
 OWNER_TELEGRAM_ID = int(getenv("OWNER_TELEGRAM_ID", ""))
\ No newline at end of file
@@ -0,0 +1,176 @@
+"""
+Fingerprint - Index used to detect updates which were already seen, even if slightly edited
+====================================================================================================
+
+Every message is normalized (Unicode NFKC, casefolded, "Dated : ..." suffix removed and whitespace collapsed)
+before it is hashed, so trivial edits give the same fingerprint (exact lookups are O(1)). For the other
+edits, the index keeps a MinHash signature of the character shingles of every message, split in bands
+(locality-sensitive hashing), so the similar messages are found without comparing with the whole history.
+
+Two messages with different numbers (like "ADMISSION NOTICE 03" and "ADMISSION NOTICE 04", or "CAP Round-II"
+and "CAP Round-III") are never treated as duplicates, however similar their text is.
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+import re
+import unicodedata
+from hashlib import blake2b
+from random import Random
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+DATED_SUFFIX_PATTERN = re.compile(
+    r"[\s,(\[-]*dated\s*:?\s*[\d./-]+[\s)\].]*$", re.IGNORECASE
+)
+ROMAN_NUMERAL = r"(?=[ivx])x{0,3}(?:ix|iv|v?i{0,3})"
+# The numbers, the Roman numerals after words like "round" (like "CAP Round-III") and the other valid Roman
+# numerals of at least 2 letters (so that words like "I" or "ill" aren't numbers)
+NUMBER_PATTERN = re.compile(
+    rf"\d+|\b(?:round|phase|part|stage)[\s-]*({ROMAN_NUMERAL})\b|\b(?=[ivx]{{2,}}\b)({ROMAN_NUMERAL})\b"
+)
+
+
+def normalize(text: str):
+    """
+    Returns the normalized form of a message
+    :param text: The message
+    """
+    text = unicodedata.normalize("NFKC", str(text)).casefold()
+    text = WHITESPACE_PATTERN.sub(" ", text).strip()
+    return DATED_SUFFIX_PATTERN.sub("", text).strip()
+
+
+def fingerprint(text: str):
+    """
+    Returns the fingerprint (hash of the normalized form) of a message
+    :param text: The message
+    """
+    return _hash_normalized(normalize(text))
+
+
+def _hash_normalized(normalized_text):
+    return blake2b(normalized_text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def find_numbers(normalized_text: str):
+    """
+    Returns the numbers of a normalized message, which must be the same for two messages to be near-duplicates
+    :param normalized_text: The normalized message
+    """
+    return [
+        match.group(1) or match.group(2) or match.group(0)
+        for match in NUMBER_PATTERN.finditer(normalized_text)
+    ]
+
+
+def shingles(normalized_text: str, size: int = 4):
+    """
+    Returns the set of the character shingles of a normalized message (characters work for Devanagari text too)
+    :param normalized_text: The normalized message
+    :param size: Number of characters in each shingle
+    """
+    if len(normalized_text) <= size:
+        return {normalized_text}
+    return {
+        normalized_text[i : i + size] for i in range(len(normalized_text) - size + 1)
+    }
+
+
+class FingerprintIndex:
+    def __init__(self, num_perm: int = 64, bands: int = 16, threshold: float = 0.8):
+        """
+        Index of the fingerprints and the MinHash signatures of the seen messages
+        :param num_perm: Number of hash functions of a MinHash signature
+        :param bands: Number of LSH bands (num_perm must be divisible by it)
+        :param threshold: Minimum estimated Jaccard similarity for two messages to be near-duplicates
+        """
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+
+        random = Random(1)  # Fixed seed, so the signatures are the same on every run
+        self._masks = [random.getrandbits(64) for _ in range(num_perm)]
+
+        self._entries = {}  # Fingerprint -> (key, message, numbers, signature)
+        self._buckets = [{} for _ in range(bands)]  # Band -> band hash -> fingerprints
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _signature(self, normalized_text):
+        """
+        Internal function which returns the MinHash signature of a normalized message. Don't use.
+        """
+        hashes = [
+            int.from_bytes(blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+            for s in shingles(normalized_text)
+        ]
+        # XOR with a random mask acts as a cheap random permutation of the 64 bit hashes
+        return tuple(min([h ^ mask for h in hashes]) for mask in self._masks)
+
+    def _band_keys(self, signature):
+        """
+        Internal function which returns the keys of the LSH buckets of a signature. Don't use.
+        """
+        return [
+            hash(signature[i * self.rows : (i + 1) * self.rows])
+            for i in range(self.bands)
+        ]
+
+    def add(self, key: str, message: str):
+        """
+        Add a message to the index. Returns False if the same fingerprint was already added
+        :param key: The history key (category) of the message
+        :param message: The message
+        """
+        normalized = normalize(message)
+        message_fingerprint = _hash_normalized(normalized)
+        if message_fingerprint in self._entries:
+            return False
+        signature = self._signature(normalized)
+        self._entries[message_fingerprint] = (
+            key,
+            message,
+            find_numbers(normalized),
+            signature,
+        )
+        for band, band_key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(band_key, set()).add(message_fingerprint)
+        return True
+
+    def find(self, message: str):
+        """
+        Returns (key, message, similarity) of the most similar message in the index, or None if there is no
+        exact or near-duplicate match
+        :param message: The message to look for
+        """
+        normalized = normalize(message)
+        message_fingerprint = _hash_normalized(normalized)
+        if message_fingerprint in self._entries:
+            key, seen_message, _, _ = self._entries[message_fingerprint]
+            return key, seen_message, 1.0
+
+        signature = self._signature(normalized)
+        numbers = find_numbers(normalized)
+        candidates = set()
+        for band, band_key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(band_key, ()))
+
+        best = None
+        for candidate in candidates:
+            key, seen_message, seen_numbers, seen_signature = self._entries[candidate]
+            if seen_numbers != numbers:
+                continue
+            similarity = (
+                sum(1 for x, y in zip(signature, seen_signature) if x == y)
+                / self.num_perm
+            )
+            if (similarity >= self.threshold) and (
+                (best is None) or (similarity > best[2])
+            ):
+                best = (key, seen_message, similarity)
+        return best
@@ -0,0 +1,481 @@
+"""
+History - In-memory store of the updates which were already seen
+====================================================================================================
+
+The history file is read only once. After that, all the lookups are done on the per-category hash sets
+kept in memory and the changes are written back to the file in batches (write-behind), instead of
+re-reading and re-writing the whole file for every single message.
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+import os
+import sqlite3
+from hashlib import sha256
+from json import loads, dumps, decoder as json_decoder
+from threading import Lock, RLock, Thread, Event
+from time import perf_counter, time
+
+
+def content_hash(message: str):
+    """
+    Returns the hash of a message used for the membership lookups
+    :param message: The message
+    """
+    return sha256(str(message).encode("utf-8")).hexdigest()
+
+
+def write_file_atomically(path: str, data: str):
+    """
+    Write a file so that a crash or a power loss leaves either the old or the new content, never a truncated file
+    :param path: Path of the file
+    :param data: The new content of the file
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+def read_history_file(path: str):
+    """
+    Returns the data of a JSON history file. A corrupted file is kept aside (instead of being silently overwritten)
+    :param path: Path of the file
+    """
+    try:
+        return loads(open(path, "r").read())
+    except FileNotFoundError:
+        return {}
+    except json_decoder.JSONDecodeError as E:
+        corrupted_path = f"{path}.corrupted"
+        os.replace(path, corrupted_path)
+        print(
+            f"[*] History: '{path}' is corrupted ({E}), it was moved to '{corrupted_path}'"
+        )
+        return {}
+
+
+class HistoryStore:
+    def __init__(self, path: str = "last_checked.json", flush_interval: float = 30):
+        """
+        Store of the seen updates, loaded once and saved in batches
+        :param path: Path of the JSON file in which the history is saved
+        :param flush_interval: Number of seconds between two writes of the changed history by the background thread
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+
+        self._lock = RLock()
+        self._write_lock = Lock()
+        self._history = (
+            {}
+        )  # Category name -> list of messages (in the order they were seen)
+        self._hashes = {}  # Category name -> set of the hashes of the messages
+        self._dirty = False
+        self._stop = Event()
+        self.stats = {"flushes": 0, "bytes_written": 0}
+        self.on_flush = None  # Called with the duration in seconds of every write
+
+        self._load()
+
+    def _load(self):
+        """
+        Internal function to read the history file. Don't use.
+        """
+        HISTORY = read_history_file(self.path)
+        for category, messages in HISTORY.items():
+            self._history[category] = list(messages)
+            self._hashes[category] = {content_hash(m) for m in messages}
+
+    def categories(self):
+        """
+        Returns the names of all the categories saved in the history
+        """
+        with self._lock:
+            return list(self._history.keys())
+
+    def get(self, category: str):
+        """
+        Returns a copy of the messages saved in a category
+        :param category: The name of the category
+        """
+        with self._lock:
+            return list(self._history.get(category, []))
+
+    def contains(self, category: str, message: str):
+        """
+        Returns True if the message was already saved in the category
+        :param category: The name of the category
+        :param message: The message
+        """
+        with self._lock:
+            return content_hash(message) in self._hashes.get(category, ())
+
+    def add(self, category: str, message: str):
+        """
+        Save a message in a category. Returns False if it was already saved
+        :param category: The name of the category
+        :param message: The message
+        """
+        message_hash = content_hash(message)
+        with self._lock:
+            hashes = self._hashes.setdefault(category, set())
+            if message_hash in hashes:
+                return False
+            hashes.add(message_hash)
+            self._history.setdefault(category, []).append(message)
+            self._dirty = True
+            return True
+
+    def replace(self, category: str, messages: list):
+        """
+        Replace all the messages of a category
+        :param category: The name of the category
+        :param messages: The new list of messages
+        """
+        with self._lock:
+            if self._history.get(category) == messages:
+                return
+            self._history[category] = list(messages)
+            self._hashes[category] = {content_hash(m) for m in messages}
+            self._dirty = True
+
+    def rename(self, old_category: str, new_category: str):
+        """
+        Move the messages of a category to a new name
+        :param old_category: The current name of the category
+        :param new_category: The new name of the category
+        """
+        with self._lock:
+            self._history[new_category] = self._history.pop(old_category)
+            self._hashes[new_category] = self._hashes.pop(old_category)
+            self._dirty = True
+
+    def flush(self):
+        """
+        Write the history to the file if anything changed since the last write
+        """
+        with self._write_lock:  # Keeps the writes in order, without blocking the lookups while writing
+            start = perf_counter()
+            with self._lock:
+                if not self._dirty:
+                    return False
+                data = dumps(self._history, indent=4)
+                self._dirty = False
+            try:
+                write_file_atomically(self.path, data)
+            except Exception:
+                with self._lock:
+                    self._dirty = True  # Try again on the next flush
+                raise
+            self.stats["flushes"] += 1
+            self.stats["bytes_written"] += len(data)
+        if self.on_flush is not None:
+            self.on_flush(perf_counter() - start)
+        return True
+
+    def _flush_loop(self):
+        """
+        Internal function running on the background flusher thread. Don't use.
+        """
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as E:
+                print(f"[*] History: Error while saving '{self.path}': {E}")
+
+    def start(self):
+        """
+        Start the background thread which writes the dirty history every flush interval
+        """
+        Thread(target=self._flush_loop, daemon=True).start()
+        return self
+
+    def close(self):
+        """
+        Stop the background thread and write the pending changes
+        """
+        self._stop.set()
+        self.flush()
+
+
+class SQLiteHistoryStore:
+    def __init__(
+        self,
+        path: str = "history.db",
+        table: str = "history",
+        flush_interval: float = 30,
+    ):
+        """
+        Store of the seen updates saved in a SQLite database (in WAL mode). Has the same functions as the HistoryStore class
+        :param path: Path of the database file
+        :param table: Name of the table, so that more than one store can share the same database
+        :param flush_interval: Number of seconds between two commits of the pending changes by the background thread
+        """
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table}")
+        self.path = path
+        self.table = table
+        self.flush_interval = flush_interval
+
+        self._lock = RLock()
+        self._stop = Event()
+        # The changes are kept in memory and written in one short transaction by flush(), so the database is
+        # never locked between two flushes (other stores can use the same database file)
+        self._added = {}  # Category name -> {hash: (message, time first seen)}
+        self._replaced = (
+            {}
+        )  # Category name -> {hash: message}, the whole new content of the category
+        self.stats = {"flushes": 0, "rows_written": 0}
+        self.on_flush = None  # Called with the duration in seconds of every commit
+
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "category TEXT NOT NULL, "
+            "hash TEXT NOT NULL, "
+            "message TEXT NOT NULL, "
+            "seen_at REAL NOT NULL)"
+        )
+        self._connection.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_category_hash ON {table} (category, hash)"
+        )
+
+    def categories(self):
+        """
+        Returns the names of all the categories saved in the history
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT DISTINCT category FROM {self.table}"
+            ).fetchall()
+            result = [row[0] for row in rows]
+            for category in list(self._added) + list(self._replaced):
+                if category not in result:
+                    result.append(category)
+            return [
+                category
+                for category in result
+                if self._replaced.get(category, True)  # Not replaced by an empty list
+            ]
+
+    def get(self, category: str):
+        """
+        Returns the messages saved in a category
+        :param category: The name of the category
+        """
+        with self._lock:
+            if category in self._replaced:
+                return list(self._replaced[category].values())
+            rows = self._connection.execute(
+                f"SELECT message FROM {self.table} WHERE category = ? ORDER BY id",
+                (category,),
+            ).fetchall()
+            added = self._added.get(category, {})
+            return [row[0] for row in rows] + [m for m, _ in added.values()]
+
+    def contains(self, category: str, message: str):
+        """
+        Returns True if the message was already saved in the category (uses the (category, hash) index)
+        :param category: The name of the category
+        :param message: The message
+        """
+        message_hash = content_hash(message)
+        with self._lock:
+            if category in self._replaced:
+                return message_hash in self._replaced[category]
+            if message_hash in self._added.get(category, ()):
+                return True
+            row = self._connection.execute(
+                f"SELECT 1 FROM {self.table} WHERE category = ? AND hash = ?",
+                (category, message_hash),
+            ).fetchone()
+        return row is not None
+
+    def add(self, category: str, message: str):
+        """
+        Save a message in a category. Returns False if it was already saved
+        :param category: The name of the category
+        :param message: The message
+        """
+        with self._lock:
+            if self.contains(category, message):
+                return False
+            message_hash = content_hash(message)
+            if category in self._replaced:
+                self._replaced[category][message_hash] = message
+            else:
+                self._added.setdefault(category, {})[message_hash] = (message, time())
+            return True
+
+    def add_many(self, category: str, messages: list):
+        """
+        Save many messages in a category
+        :param category: The name of the category
+        :param messages: The list of messages
+        """
+        with self._lock:
+            for message in messages:
+                self.add(category, message)
+
+    def replace(self, category: str, messages: list):
+        """
+        Replace all the messages of a category
+        :param category: The name of the category
+        :param messages: The new list of messages
+        """
+        with self._lock:
+            if self.get(category) == messages:
+                return
+            self._added.pop(category, None)
+            self._replaced[category] = {content_hash(m): m for m in messages}
+
+    def rename(self, old_category: str, new_category: str):
+        """
+        Move the messages of a category to a new name
+        :param old_category: The current name of the category
+        :param new_category: The new name of the category
+        """
+        with self._lock:
+            self.flush()  # The pending changes are saved under the old name first
+            self._connection.execute(
+                f"UPDATE {self.table} SET category = ? WHERE category = ?",
+                (new_category, old_category),
+            )
+
+    def seen_times(self, category_prefix: str = ""):
+        """
+        Returns the times (from time.time()) at which the messages were first seen
+        :param category_prefix: Only return the times of the categories starting with this prefix
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT seen_at FROM {self.table} WHERE substr(category, 1, ?) = ? ORDER BY seen_at",
+                (len(category_prefix), category_prefix),
+            ).fetchall()
+            pending = [
+                seen_at
+                for category, added in self._added.items()
+                if category.startswith(category_prefix)
+                for _, seen_at in added.values()
+            ]
+        return sorted([row[0] for row in rows] + pending)
+
+    def _write(self, added: dict, replaced: dict):
+        """
+        Internal function which writes the pending changes in one transaction. Don't use.
+        """
+        rows_written = 0
+        now = time()
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            for category, messages in replaced.items():
+                # The messages which stay keep their row (and so the time they were first seen)
+                self._connection.execute(
+                    f"DELETE FROM {self.table} WHERE category = ? AND hash NOT IN (SELECT value FROM json_each(?))",
+                    (category, dumps(list(messages))),
+                )
+                cursor = self._connection.executemany(
+                    f"INSERT OR IGNORE INTO {self.table} (category, hash, message, seen_at) VALUES (?, ?, ?, ?)",
+                    [(category, h, m, now) for h, m in messages.items()],
+                )
+                rows_written += cursor.rowcount
+            for category, messages in added.items():
+                cursor = self._connection.executemany(
+                    f"INSERT OR IGNORE INTO {self.table} (category, hash, message, seen_at) VALUES (?, ?, ?, ?)",
+                    [(category, h, m, seen_at) for h, (m, seen_at) in messages.items()],
+                )
+                rows_written += cursor.rowcount
+            self._connection.execute("COMMIT")
+        except Exception:
+            self._connection.execute("ROLLBACK")
+            raise
+        return rows_written
+
+    def flush(self):
+        """
+        Write the pending changes in a single short transaction
+        """
+        with self._lock:
+            if not (self._added or self._replaced):
+                return False
+            start = perf_counter()
+            # Written while holding the lock, so that the lookups never miss a change which is being written
+            self.stats["rows_written"] += self._write(self._added, self._replaced)
+            self._added, self._replaced = {}, {}
+            self.stats["flushes"] += 1
+        if self.on_flush is not None:
+            self.on_flush(perf_counter() - start)
+        return True
+
+    def _flush_loop(self):
+        """
+        Internal function running on the background flusher thread. Don't use.
+        """
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as E:
+                print(f"[*] History: Error while saving '{self.path}': {E}")
+
+    def start(self):
+        """
+        Start the background thread which commits the pending changes every flush interval
+        """
+        Thread(target=self._flush_loop, daemon=True).start()
+        return self
+
+    def close(self):
+        """
+        Stop the background thread, commit the pending changes and close the database
+        """
+        self._stop.set()
+        self.flush()
+        with self._lock:
+            self._connection.close()
+
+
+def migrate_json_to_sqlite(json_path: str, store: SQLiteHistoryStore):
+    """
+    One-shot import of a JSON history file into a SQLite store. The JSON file is renamed after the import so it isn't imported again
+    :param json_path: Path of the JSON history file
+    :param store: The SQLite store
+    """
+    if not os.path.exists(json_path):
+        return False
+    HISTORY = read_history_file(json_path)
+    for category, messages in HISTORY.items():
+        store.add_many(category, messages)
+    store.flush()
+    os.replace(json_path, f"{json_path}.migrated")
+    return True
+
+
+def open_history_store(
+    backend: str, json_path: str, table: str, flush_interval: float = 30
+):
+    """
+    Returns the history store of the chosen backend
+    :param backend: "json" or "sqlite"
+    :param json_path: Path of the JSON file (used by the "json" backend, and imported once by the "sqlite" backend)
+    :param table: Name of the table used by the "sqlite" backend
+    :param flush_interval: Number of seconds between two background writes
+    """
+    if backend == "json":
+        return HistoryStore(json_path, flush_interval=flush_interval)
+    if backend == "sqlite":
+        store = SQLiteHistoryStore("history.db", table, flush_interval=flush_interval)
+        if migrate_json_to_sqlite(json_path, store):
+            print(f"[*] History: Imported '{json_path}' into the '{table}' table")
+        return store
+    raise ValueError(
+        "Invalid history backend, please choose one from the list: ['json', 'sqlite']"
+    )
@@ -1,18 +1,28 @@
 import os
-from random import randint
-from time import sleep, strftime
+from hashlib import sha256
+from time import sleep, strftime, time, perf_counter
 from datetime import datetime
-from json import loads, dumps, decoder as json_decoder
-from threading import Thread
+from threading import Lock, Thread
+from queue import Queue, Empty
+from html import escape
+from concurrent.futures import ThreadPoolExecutor
 
-from config import TELEGRAM_BOT_TOKEN, OWNER_TELEGRAM_ID
-from pyTelegramBot import TelegramBot
+from config import TELEGRAM_BOT_TOKEN, TELEGRAM_API_URL, OWNER_TELEGRAM_ID
+from pyTelegramBot import TelegramBot, PRIORITY_HIGH
 
 try:
-    from bs4 import BeautifulSoup
-    from requests import get
-
-    from gtts import gTTS
+    from portal_client import PortalClient
+    from portals import load_portals
+    from history import open_history_store
+    from sections import extract_items
+    from snapshot import Snapshot, load_snapshot
+    from fingerprint import FingerprintIndex, fingerprint
+    from playback import get_playback_backend
+    from status import StatusReporter
+    from subscribers import SubscriberStore, broadcast, parse_filters
+    from metrics import Metrics
+
+    from tts import ClipCache, SpeechSynthesizer, get_engines
 except ModuleNotFoundError:
     print("[*] Some necessary package requirements were not found! Installing them...")
     os.system("pip install -r requirements.txt")
@@ -25,240 +35,731 @@ USER_NAME = "Siddhesh"
 WAIT = 180
 
 DEBUG = False
-REPLACE_TERMS = {"MH": "Maharashtra", "AI": "All India"}
+PLAYBACK_BACKEND = "termux"  # "termux", "mpg123", "null" or "file" (see playback.py)
+HISTORY_BACKEND = "json"  # "json" or "sqlite" (crash-safe, the JSON files are imported into "history.db" once)
+HISTORY_FLUSH_INTERVAL = 30  # Seconds between two writes of the history files
+NEAR_DUPLICATE_THRESHOLD = (
+    0.8  # Minimum similarity for an edited message to be treated as already seen
+)
+PARSER_BACKEND = "lxml"  # "lxml", "lxml-stream" or "html.parser" (see sections.py)
+DIGEST_THRESHOLD = (
+    3  # Announce this many (or more) updates found together as a single digest
+)
+DIGEST_WINDOW = 5  # Seconds to wait for more updates before announcing them
+SYNTHESIS_WORKERS = 3  # Voice messages synthesized in parallel
+SYNTHESIS_AHEAD = 10  # Maximum number of voice messages prepared before they are played
+TTS_ENGINES = [
+    "gtts",
+    "espeak",
+]  # Synthesis engines, in the order they are tried (see tts.py)
+TTS_CACHE_MAX_MB = 50  # Size limit of the cache of the synthesized voice clips
+STATUS_MIN_INTERVAL = (
+    30  # Minimum seconds between two edits of the status message on Telegram
+)
+STATUS_MAX_INTERVAL = (
+    900  # The status message is edited after this many seconds even if nothing changed
+)
+BROADCAST_MAX_IN_FLIGHT = (
+    32  # Maximum number of alert messages waiting in the send queue at once
+)
+TELEGRAM_WEBHOOK_URL = (
+    None  # Public HTTPS URL of the webhook, the bot polls for updates if it is None
+)
+TELEGRAM_WEBHOOK_PORT = (
+    8443  # Local port of the webhook server (behind the reverse proxy)
+)
+METRICS_ENABLED = True  # Time the stages of the polls and the Telegram API calls
+# The spans and logs are appended to it as JSON lines (like "metrics.jsonl"). Off by default to spare the flash storage
+METRICS_LOG_PATH = None
+METRICS_LOG_MAX_MB = 5  # The log is moved to "<path>.1" when it grows over this size
+METRICS_PORT = (
+    9108  # Local port of the Prometheus metrics endpoint, None to turn it off
+)
 
 
 if DEBUG:
     WAIT = 5
-
-bot = TelegramBot(TELEGRAM_BOT_TOKEN)
+    PLAYBACK_BACKEND = "mpg123"
+
+metrics = Metrics(
+    enabled=METRICS_ENABLED,
+    log_path=METRICS_LOG_PATH,
+    max_log_bytes=METRICS_LOG_MAX_MB * 1024 * 1024,
+)
+bot = TelegramBot(TELEGRAM_BOT_TOKEN, api_url=TELEGRAM_API_URL)
+bot.on_api_call = lambda method, duration, error: metrics.record_span(
+    "telegram_api", duration, error, method=method
+)
+portal_client = PortalClient(connect_timeout=5, read_timeout=20, retries=3)
+
+# Both are loaded once and written back in batches by a background thread
+history = open_history_store(
+    HISTORY_BACKEND, "last_checked.json", "history", HISTORY_FLUSH_INTERVAL
+)
+latest_updates = open_history_store(
+    HISTORY_BACKEND, "updates.json", "latest_updates", HISTORY_FLUSH_INTERVAL
+)
+player = get_playback_backend(PLAYBACK_BACKEND)
+clip_cache = ClipCache("tts_cache", max_bytes=TTS_CACHE_MAX_MB * 1024 * 1024)
+synthesizer = SpeechSynthesizer(get_engines(TTS_ENGINES), clip_cache)
+fingerprint_indexes = {}  # Portal name -> FingerprintIndex
+subscribers = SubscriberStore("subscribers.json")
+ALERT_QUEUE = Queue()  # The new updates waiting to be announced
+# The updates whose voice messages are being prepared, in the order they will be played
+PLAYBACK_QUEUE = Queue(maxsize=SYNTHESIS_AHEAD)
+telegram_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="telegram")
+synthesis_pool = ThreadPoolExecutor(
+    max_workers=SYNTHESIS_WORKERS, thread_name_prefix="synthesis"
+)
+alert_stats = {"queued": 0, "announced": 0}
+alert_stats_lock = Lock()  # Changed by the portal workers and the announcer thread
 
 
 def simple_log(message):
     current_time = strftime("%d/%m/%Y %H:%M:%S")
     print(f"[*] [{current_time}]: {message}")
+    metrics.event("log", message=message)
+
+
+def get_status_snapshot(portals):
+    """
+    Returns the metrics shown in the status message on Telegram. The values are rounded, so the message
+    is edited only when something really changed
+    """
+    snapshot = {}
+    for portal in portals:
+        stats = portal.stats
+        fetch = stats["last_fetch_latency"]
+        parse = stats["last_parse_time"]
+        snapshot[portal.title] = (
+            f"fetch {f'{fetch:.1f}s' if fetch is not None else '-'}, "
+            f"parse {f'{parse * 1000:.0f}ms' if parse is not None else '-'}, "
+            f"{stats['polls']} polls, {stats['not_modified'] + stats['unchanged']} skipped as unchanged, "
+            f"{stats['errors']} errors"
+        )
+        if portal.last_error is not None:
+            snapshot[f"{portal.title} last error"] = str(portal.last_error)[:200]
+    with alert_stats_lock:
+        queued, announced = alert_stats["queued"], alert_stats["announced"]
+    snapshot["Alerts"] = (
+        f"{queued} queued, {announced} announced, "
+        f"{ALERT_QUEUE.qsize() + PLAYBACK_QUEUE.qsize()} waiting"
+    )
+    return snapshot
 
 
-def send_telegram_updates():
-    message = bot.send_message(OWNER_TELEGRAM_ID, "Program running!")
-    print(f"[*] Telegram Updates: Sent the initial message with the ID: {message.id}")
+def save_latest_updates(portal, updates):
+    for update_name, update_messages in updates.items():
+        latest_updates.replace(portal.history_key(update_name), update_messages)
 
-    while True:
-        try:
-            formatted_time = strftime("%d/%m/%Y %H:%M:%S")
-            message.edit(
-                f"<b>Program Status:</b> <i>Running!</i>\n\n<b>Time:</b> <i>{formatted_time}</i>"
-            )
-            sleep(60)
-        except Exception as E:
-            print(f"[*] Telegram Updates: An unknown error occurred: {E}")
 
+def cleanup_old_updates(portal, updates):
+    for update_name in portal.categories:
+        history.replace(portal.history_key(update_name), updates.get(update_name, []))
 
-def set_last_checked(update, content):
-    try:
-        HISTORY = loads(open("last_checked.json", "r").read())
-    except (FileNotFoundError, json_decoder.JSONDecodeError):
-        HISTORY = {
-            "News": [],
-            "Notifications": [],
-            "Downloads": [],
-            "Important": [],
-            "Buttons": [],
-        }
+
+def migrate_legacy_history(portals):
+    """
+    Move the history saved before the portal namespaces existed (with keys like "News") to the portal which takes it over
+    """
+    for portal in portals:
+        if not portal.legacy_history:
+            continue
+        for store in (history, latest_updates):
+            moved = False
+            saved_categories = store.categories()
+            for update_name in portal.categories:
+                if (update_name in saved_categories) and (
+                    portal.history_key(update_name) not in saved_categories
+                ):
+                    store.rename(update_name, portal.history_key(update_name))
+                    moved = True
+            if moved:
+                store.flush()
+                simple_log(
+                    f"Moved the old history in '{store.path}' to the portal '{portal.name}'"
+                )
+
+
+def get_updates_from_website(portal):
+    """
+    Returns the snapshot of the updates of the portal or None if the page didn't change since the last poll
+    """
+    portal.stats["polls"] += 1
+    portal.last_error = None
     try:
-        HISTORY[update]  # Check if the key name exists
-    except KeyError:
-        HISTORY[update] = []
+        headers = {}
+        if portal.etag:
+            headers["if-none-match"] = portal.etag
+        if portal.last_modified:
+            headers["if-modified-since"] = portal.last_modified
+        start = perf_counter()
+        with metrics.span("fetch", portal=portal.name):
+            response = portal_client.get(portal.url, headers=headers)
+        portal.stats["last_fetch_latency"] = perf_counter() - start
+        if response.status_code == 304:
+            portal.stats["not_modified"] += 1
+            metrics.inc("polls_total", portal=portal.name, result="not_modified")
+            return None
+        response.raise_for_status()
+
+        content = response.content
+        body_hash = sha256(content).hexdigest()
+        if body_hash == portal.body_hash:
+            portal.stats["unchanged"] += 1
+            metrics.inc("polls_total", portal=portal.name, result="unchanged")
+            return None
+
+        start = perf_counter()
+        with metrics.span("parse", portal=portal.name):
+            result = Snapshot(extract_items(content, portal.profile, PARSER_BACKEND))
+        portal.stats["last_parse_time"] = perf_counter() - start
+        save_latest_updates(portal, result.texts())
+
+        # Only remember the page once it was parsed successfully, so a failed parse is retried on the next poll.
+        # _check_portal() forgets it again if the rest of the poll fails
+        portal.etag = response.headers.get("etag")
+        portal.last_modified = response.headers.get("last-modified")
+        portal.body_hash = body_hash
+        portal.stats["changed"] += 1
+        metrics.inc("polls_total", portal=portal.name, result="changed")
+        return result
+
+    except Exception as E:
+        portal.stats["errors"] += 1
+        metrics.inc("polls_total", portal=portal.name, result="error")
+        portal.last_error = E
+        simple_log(f"Error while parsing the updates of '{portal.name}': {E}")
+        return None
+
+
+def get_speech_segments(portal, update_name, message, edited=False):
+    """
+    Returns the parts of a voice message. All the parts except the update itself are the same for many messages
+    """
+    if edited:
+        if update_name == portal.profile["buttons"]:
+            intro = f"Hello {USER_NAME}, a button on the {portal.title} CET Cell portal was changed, it is now named as,"
+        else:
+            intro = f"Hello {USER_NAME}, a '{update_name}' message on the {portal.title} CET Cell portal was updated, it now states that"
+        return [
+            intro,
+            message,
+            "Please visit the official website for more information.",
+        ]
+    if update_name == portal.profile["buttons"]:
+        return [
+            f"Hello {USER_NAME}, there is a new button added on the {portal.title} CET Cell portal, named as,",
+            message,
+            "Please visit the official website for more details.",
+        ]
+    return [
+        f"Hello {USER_NAME}, there is a new '{update_name}' message from the {portal.title} CET Cell portal, stating that",
+        message,
+        "Please visit the official website for more information.",
+    ]
+
+
+def group_alerts(alerts):
+    """
+    Returns the alerts grouped by portal and category, in the order they were found
+    """
+    groups = {}
+    for portal, update_name, message, edited in alerts:
+        groups.setdefault((portal, update_name, edited), []).append(message)
+    return groups
+
+
+def get_digest_segments(alerts):
+    """
+    Returns the parts of a single voice message which announces many updates, grouped by category
+    """
+    segments = [
+        f"Hello {USER_NAME}, there are {len(alerts)} new updates from CET Cell."
+    ]
+    for (portal, update_name, edited), messages in group_alerts(alerts).items():
+        plural = "s" if len(messages) > 1 else ""
+        kind = "changed" if edited else "new"
+        if update_name == portal.profile["buttons"]:
+            segments.append(
+                f"{len(messages)} {kind} button{plural} on the {portal.title} CET Cell portal, named as,"
+            )
+        else:
+            segments.append(
+                f"{len(messages)} {kind} '{update_name}' message{plural} on the {portal.title} CET Cell portal, stating that,"
+            )
+        segments.extend(messages)
+    segments.append("Please visit the official website for more information.")
+    return segments
 
-    HISTORY[update].append(content)
-    with open("last_checked.json", "w") as file:
-        file.write(dumps(HISTORY, indent=4))
 
+def get_telegram_alert_text(alerts):
+    lines = [f"<b>{len(alerts)} new update(s) from CET Cell</b>"]
+    for (portal, update_name, edited), messages in group_alerts(alerts).items():
+        heading = f"{escape(portal.title)} - {escape(update_name)}"
+        lines.append(f"\n<b>{heading}{' (edited)' if edited else ''}:</b>")
+        lines.extend(f"• {escape(message)}" for message in messages)
+    return "\n".join(lines)
 
-def cleanup_old_updates():
-    try:
-        ALL_UPDATES = loads(open("updates.json", "r").read())
 
-        with open("last_checked.json", "w") as file:
-            file.write(dumps(ALL_UPDATES, indent=4))
+def send_telegram_alert(alerts):
+    """
+    Send the alerts to the owner and to the subscribers whose filters match them. The chats which should
+    receive the same alerts get the same message, broadcast at once
+    """
+    try:
+        # Chat ID -> indexes of the alerts it should receive. The owner receives all of them
+        recipients = {OWNER_TELEGRAM_ID: set(range(len(alerts)))}
+        for i, (portal, update_name, _, _) in enumerate(alerts):
+            for chat_id in subscribers.recipients(portal.name, update_name):
+                recipients.setdefault(chat_id, set()).add(i)
+        groups = {}
+        for chat_id, indexes in recipients.items():
+            groups.setdefault(tuple(sorted(indexes)), []).append(chat_id)
+
+        for indexes, chat_ids in groups.items():
+            text = get_telegram_alert_text([alerts[i] for i in indexes])
+            with metrics.span("broadcast"):
+                report = broadcast(
+                    bot, chat_ids, text, PRIORITY_HIGH, BROADCAST_MAX_IN_FLIGHT
+                )
+            metrics.inc("alert_messages_delivered_total", len(report["delivered"]))
+            metrics.inc("alert_messages_failed_total", len(report["failed"]))
+            simple_log(
+                f"Telegram alert delivered to {len(report['delivered'])}/{len(chat_ids)} chat(s) "
+                f"in {report['duration']:.1f}s"
+            )
+            for chat_id, error in report["failed"].items():
+                simple_log(f"Couldn't send the Telegram alert to {chat_id}: {error}")
+            subscribers.record_deliveries(
+                report["delivered"], list(report["failed"].keys())
+            )
+            for chat_id in report["blocked"]:
+                if subscribers.unsubscribe(chat_id):
+                    simple_log(f"Unsubscribed {chat_id} as the alerts can't be sent")
     except Exception as E:
-        simple_log(f"Error while cleaning the updates history: {E}")
+        simple_log(f"Error while sending the Telegram alert: {E}")
+
+
+def register_bot_commands(portals):
+    """
+    Add the /subscribe and /unsubscribe commands to the bot
+    """
+    filter_names = sorted(
+        {portal.name for portal in portals}
+        | {update_name for portal in portals for update_name in portal.categories}
+    )
 
+    def save_subscription(text, message):
+        filters = parse_filters(text)
+        known = {name.lower() for name in filter_names}
+        unknown = [f for f in filters if f.split("/")[-1].lower() not in known]
+        if unknown:
+            bot.send_message(
+                message.chat_id,
+                f"Unknown name(s): <i>{escape(', '.join(unknown))}</i>. Please try again or send <i>all</i>.",
+            )
+            return
+        name = message.chat.get("title") or message.from_user.first_name
+        subscribers.subscribe(message.chat_id, filters, name)
+        bot.cancel_text_input(message.from_user.id)
+        simple_log(f"{message.chat_id} ({name}) subscribed to: {filters or 'all'}")
+        bot.send_message(
+            message.chat_id,
+            f"<b>Subscribed!</b> You will receive the new updates of: <i>{escape(', '.join(filters) or 'all')}</i>\n\n"
+            "Use /unsubscribe to stop receiving them.",
+        )
+
+    @bot.on_command(
+        ["subscribe"],
+        accept_text_input=save_subscription,
+        help_text=["Receive the new CET Cell updates"],
+    )
+    def subscribe_command(message):
+        bot.send_message(
+            message.chat_id,
+            "Which updates do you want to receive? Send <i>all</i>, or a comma separated list of the names of the "
+            f"categories or portals: <i>{escape(', '.join(filter_names))}</i>",
+        )
 
-def get_last_checked(update):
+    @bot.on_command(["unsubscribe"], help_text=["Stop receiving the updates"])
+    def unsubscribe_command(message):
+        if subscribers.unsubscribe(message.chat_id):
+            simple_log(f"{message.chat_id} unsubscribed")
+            bot.send_message(message.chat_id, "<b>Unsubscribed!</b>")
+        else:
+            bot.send_message(message.chat_id, "You are not subscribed.")
+
+
+def create_txt_to_speech_message(segments, output_path):
+    with metrics.span("synthesis"):
+        voice_path = synthesizer.create_voice_message(segments, output_path)
+    stats = ", ".join(
+        f"{name}: {engine['avg_latency']:.2f}s avg ({engine['clips']} clips, {engine['failures']} failures)"
+        for name, engine in synthesizer.latency_stats().items()
+        if engine["avg_latency"] is not None
+    )
+    simple_log(f"Synthesis latency - {stats}")
+    return voice_path
+
+
+def prepare_template_clips(portals):
+    """
+    Synthesize the fixed parts of the voice messages of every portal in advance
+    """
+    templates = []
+    for portal in portals:
+        for update_name in portal.categories:
+            for edited in (False, True):
+                segments = get_speech_segments(portal, update_name, "", edited)
+                templates.extend((segments[0], segments[2]))
     try:
-        HISTORY = loads(open("last_checked.json", "r").read())
-        result = HISTORY[update]
-    except (FileNotFoundError, json_decoder.JSONDecodeError, KeyError):
-        HISTORY = {
-            "News": [],
-            "Notifications": [],
-            "Downloads": [],
-            "Important": [],
-            "Buttons": [],
-        }
-        result = HISTORY[update]
+        synthesizer.prepare_clips(templates)
+    except Exception as E:
+        simple_log(f"Error while preparing the voice message templates: {E}")
+
+
+def play_voice_message(voice_path):
+    with metrics.span("playback"):
+        player.play("notification-sound.mp3")
+        player.play(voice_path)
+
+
+def get_fingerprint_index(portal):
+    """
+    Returns the fingerprint index of a portal, built from its history the first time it is used
+    """
+    if portal.name not in fingerprint_indexes:
+        index = FingerprintIndex(threshold=NEAR_DUPLICATE_THRESHOLD)
+        for update_name in portal.categories:
+            key = portal.history_key(update_name)
+            for message in history.get(key):
+                index.add(key, message)
+        fingerprint_indexes[portal.name] = index
+    return fingerprint_indexes[portal.name]
+
+
+def get_unique_updates(portal, website_updates):
+    result = {update_name: [] for update_name in portal.categories}
+    index = get_fingerprint_index(portal)
+    important_name = portal.profile["important"]
+    for update_name, update_messages in website_updates.items():
+        key = portal.history_key(update_name)
+        for message in update_messages:
+            if history.contains(key, message):
+                continue
+            match = index.find(message)
+            if match is None:
+                simple_log(
+                    f"New Update found - {portal.name} - {update_name}: {message}"
+                )
+                index.add(key, message)
+                result[update_name].append(message)
+            else:
+                matched_key, matched_message, similarity = match
+                simple_log(
+                    f"Already seen update - {portal.name} - {update_name}: {message} "
+                    f"(matches '{matched_message}' in {matched_key}, similarity {similarity:.2f})"
+                )
+            # The important messages are saved only after they are announced
+            if update_name != important_name:
+                history.add(key, message)
     return result
 
 
-def get_updates_from_website():
-    try:
-        headers = {"user-agent": f"Device {randint(100, 999)}"}
-        content = get(
-            "https://fe2025.mahacet.org/StaticPages/HomePage", headers=headers
-        ).content
-        soup = BeautifulSoup(content, "html.parser")
-
-        cards = soup.find_all("div", class_="card-body")
-
-        UPDATES = []
-        for card in cards:
-            parts = []
-            paragraphs = card.find_all("p")
-            for paragraph in paragraphs:
-                text_content = str(paragraph.get_text()).replace("\xa0", " ")
-                text_content = text_content.strip()
-                parts.append(text_content)
-            UPDATES.append(parts)
-
-        raw_important_messages_container = soup.find("div", class_="important-text")
-        raw_important_messages = raw_important_messages_container.find_all("lang")
-
-        important_messages = []
-        for message in raw_important_messages:
-            important_messages.append(
-                str(message.get_text()).replace("\xa0", " ").strip()
+def get_edited_updates(portal, changes):
+    """
+    Returns the updates whose links (like a replaced PDF) or text changed since the last poll
+    :param portal: The portal
+    :param changes: The SectionDiff of every changed section (see snapshot.py)
+    """
+    result = {update_name: [] for update_name in portal.categories}
+    index = get_fingerprint_index(portal)
+    important_name = portal.profile["important"]
+    for update_name, change in changes.items():
+        key = portal.history_key(update_name)
+        for (old_message, old_links), (message, links) in change.edited:
+            if message != old_message:
+                # An edited text which was already announced once isn't announced again
+                if history.contains(key, message):
+                    continue
+                # A trivial edit of the text (like a new "Dated : ..." suffix) with the same links is only saved
+                match = None
+                if links == old_links:
+                    if fingerprint(message) == fingerprint(old_message):
+                        match = (key, old_message, 1.0)
+                    else:
+                        match = index.find(message)
+                index.add(key, message)
+                if match is not None:
+                    matched_key, matched_message, similarity = match
+                    simple_log(
+                        f"Already seen update - {portal.name} - {update_name}: {message} "
+                        f"(matches '{matched_message}' in {matched_key}, similarity {similarity:.2f})"
+                    )
+                    if update_name != important_name:
+                        history.add(key, message)
+                    continue
+            simple_log(
+                f"Edited update - {portal.name} - {update_name}: {message} "
+                f"(was '{old_message}', links {list(old_links)} -> {list(links)})"
             )
-        UPDATES.append(important_messages)
+            result[update_name].append(message)
+            if update_name != important_name:
+                history.add(key, message)
+    return result
 
-        raw_button_messages_container = soup.find("div", id="LeftMenu")
-        raw_button_link_boxes_containers = raw_button_messages_container.find_all(
-            "div", class_="LinkBox"
-        )
 
-        raw_button_names = []
-        for container in raw_button_link_boxes_containers:
-            for contents in container:
-                raw_button_names.extend(contents.find_all("a"))
-
-        button_names = []
-        for button_name in raw_button_names:
-            button_text = str(button_name.get_text()).strip()
-            for term in REPLACE_TERMS:
-                button_text = button_text.replace(term, REPLACE_TERMS[term])
-            button_names.append(button_text)
-        UPDATES.append(button_names)
-
-        NEWS, NOTIFICATIONS, DOWNLOADS, IMPORTANT, BUTTONS = UPDATES
-        result = {
-            "News": NEWS,
-            "Notifications": NOTIFICATIONS,
-            "Downloads": DOWNLOADS,
-            "Important": IMPORTANT,
-            "Buttons": BUTTONS,
-        }
-
-        with open("updates.json", "w") as file:
-            file.write(dumps(result, indent=4))
-        return result
+def check_portal(portal):
+    """
+    Check a single portal for updates and queue the new ones to be announced. Runs on the thread pool
+    """
+    with metrics.span("poll", portal=portal.name):
+        _check_portal(portal)
+
 
+def _check_portal(portal):
+    """
+    Internal function which checks a portal, timed by check_portal(). Don't use.
+    """
+    try:
+        simple_log(f"Checking for updates on '{portal.name}'...")
+        SNAPSHOT = get_updates_from_website(portal)
+        stats = portal.stats
+        simple_log(
+            f"Poll stats of '{portal.name}': {stats['polls']} polls, {stats['not_modified'] + stats['unchanged']} skipped "
+            f"({stats['not_modified']} not modified, {stats['unchanged']} unchanged), "
+            f"{stats['changed']} changed, {stats['errors']} errors"
+        )
+        latency = portal_client.latency_stats()
+        if latency["last_latency"] is not None:
+            simple_log(
+                f"Fetch latency: last {latency['last_latency']:.2f}s, avg {latency['avg']:.2f}s, "
+                f"p95 {latency['p95']:.2f}s, max {latency['max']:.2f}s ({latency['retries']} retries)"
+            )
+        # Nothing changed, so there is nothing to compare or save
+        if SNAPSHOT is None:
+            schedule_next_poll(portal, success=portal.last_error is None)
+            return
+        with metrics.span("diff", portal=portal.name):
+            # Only the sections whose hash changed are compared, and only their added items with the history
+            CHANGES = SNAPSHOT.diff(portal.snapshot)
+            UNNOTIFIED_UPDATES = get_unique_updates(
+                portal,
+                {
+                    update_name: [message for message, _ in change.added]
+                    for update_name, change in CHANGES.items()
+                },
+            )
+            EDITED_UPDATES = get_edited_updates(portal, CHANGES)
+        metrics.inc(
+            "sections_skipped_total",
+            len(SNAPSHOT.sections) - len(CHANGES),
+            portal=portal.name,
+        )
+        for update_name, change in CHANGES.items():
+            for message, _ in change.removed:
+                simple_log(f"Removed update - {portal.name} - {update_name}: {message}")
+            if change.removed:
+                metrics.inc(
+                    "removed_updates_total",
+                    len(change.removed),
+                    portal=portal.name,
+                    category=update_name,
+                )
+        changed = False
+        for updates, edited in ((UNNOTIFIED_UPDATES, False), (EDITED_UPDATES, True)):
+            for update_name, update_messages in updates.items():
+                for message in update_messages:
+                    with alert_stats_lock:
+                        alert_stats["queued"] += 1
+                    ALERT_QUEUE.put((portal, update_name, message, edited))
+                    metrics.inc(
+                        "alerts_total",
+                        portal=portal.name,
+                        category=update_name,
+                        kind="edited" if edited else "new",
+                    )
+                    changed = True
+        with metrics.span("history_update", portal=portal.name):
+            cleanup_old_updates(portal, SNAPSHOT.texts())
+            if CHANGES:
+                SNAPSHOT.save(portal.snapshot_path)
+            portal.snapshot = SNAPSHOT
+        schedule_next_poll(portal, success=True, changed=changed)
     except Exception as E:
-        simple_log(f"Error while parsing the updates: {E}")
-        return loads(open("updates.json", "r").read())
+        # The page is fetched and compared again on the next poll, so its updates aren't lost
+        portal.etag = portal.last_modified = portal.body_hash = None
+        simple_log(f"Error while checking '{portal.name}': {E}")
+        schedule_next_poll(portal, success=False)
+
+
+def schedule_next_poll(portal, success, changed=False):
+    """
+    Schedule the next poll of a portal from the result of the last one
+    :param portal: The portal
+    :param success: Set it to False if the poll failed
+    :param changed: Set it to True if new updates were found
+    """
+    next_poll = portal.scheduler.record_poll(success, changed)
+    simple_log(
+        f"Next poll of '{portal.name}' at {datetime.fromtimestamp(next_poll).strftime('%H:%M:%S')} "
+        f"(in {next_poll - time():.0f}s, {portal.scheduler.reason})"
+    )
 
 
-def create_txt_to_speech_message(update_name, message):
-    if update_name == "Buttons":
-        text = f"Hello {USER_NAME}, there is a new button added on the CET Cell portal, named as, {message}. Please visit the official website for more details."
-    else:
-        text = f"Hello {USER_NAME}, there is a new '{update_name}' message from CET Cell, stating that {message}. Please visit the official website for more information."
-    tts = gTTS(text=text, lang="en")
-    tts.save("output.mp3")
+def collect_alerts():
+    """
+    Wait for the next alert and collect the other alerts which arrive within the coalescing window
+    """
+    alerts = [ALERT_QUEUE.get()]
+    deadline = time() + DIGEST_WINDOW
+    while True:
+        remaining = deadline - time()
+        try:
+            alerts.append(
+                ALERT_QUEUE.get(timeout=remaining)
+                if remaining > 0
+                else ALERT_QUEUE.get_nowait()
+            )
+        except Empty:
+            return alerts
 
 
-def play_voice_message():
-    while not DEBUG:
+def announce_updates():
+    """
+    Take the queued updates in order and start synthesizing their voice messages on the synthesis pool,
+    so the next messages are ready while the current one is being played. A burst of updates is announced
+    as a single digest
+    """
+    alert_id = 0
+    while True:
+        alerts = collect_alerts()
+        if len(alerts) >= DIGEST_THRESHOLD:
+            simple_log(f"Announcing {len(alerts)} updates as a digest")
+            batches = [(alerts, get_digest_segments(alerts))]
+        else:
+            batches = [([alert], get_speech_segments(*alert)) for alert in alerts]
+
+        for batch_alerts, segments in batches:
+            alert_id += 1
+            telegram_pool.submit(send_telegram_alert, batch_alerts)
+            voice_message = None
+            current_hour = int(datetime.now().hour)
+            if (current_hour > 8) and (current_hour < 23):
+                voice_message = synthesis_pool.submit(
+                    create_txt_to_speech_message, segments, f"output_{alert_id}"
+                )
+            # Blocks when enough messages are ready, so the synthesis never runs too far ahead of the playback
+            PLAYBACK_QUEUE.put((batch_alerts, voice_message))
+
+
+def play_updates():
+    """
+    Play the prepared voice messages one after the other, in the order the updates were found,
+    so that the voice messages of different portals never overlap
+    """
+    while True:
+        alerts, voice_message = PLAYBACK_QUEUE.get()
+        voice_path = None
         try:
-            info = os.popen("termux-media-player info").read()
-            status = loads(info).get("status")
-            if status == "stopped":
-                break
-            sleep(0.1)
+            if voice_message is not None:
+                voice_path = voice_message.result()
+                play_voice_message(voice_path)
         except Exception as E:
-            simple_log(f"Termux API Sound playing error: {E}")
-            break
-    (
-        os.system("mpg123 notification-sound.mp3")
-        if DEBUG
-        else os.system("termux-media-player play notification-sound.mp3")
-    )
-    sleep(2)
-    (
-        os.system("mpg123 output.mp3")
-        if DEBUG
-        else os.system("termux-media-player play output.mp3")
-    )
-    if not DEBUG:
-        sleep(15)
-
-
-def get_unique_updates(website_updates):
-    result = {
-        "News": [],
-        "Notifications": [],
-        "Downloads": [],
-        "Important": [],
-        "Buttons": [],
-    }
-    for update_name, update_messages in website_updates.items():
-        if update_name == "Important":
-            news_updates_small_case = [str(m).lower() for m in get_last_checked("News")]
-            important_message_history = get_last_checked("Important")
-            for message in update_messages:
-                if (message not in news_updates_small_case) and (
-                    message not in important_message_history
-                ):
-                    simple_log(f"New Update found - Important: {message}")
-                    result["Important"].append(message)
-        else:
-            history = get_last_checked(update_name)
-            for message in update_messages:
-                if message not in history:
-                    simple_log(f"New Update found - {update_name}: {message}")
-                    result[update_name].append(message)
-                    set_last_checked(update_name, message)
-    return result
+            simple_log(f"Error while announcing {len(alerts)} update(s): {E}")
+        finally:
+            for portal, update_name, message, _ in alerts:
+                history.add(portal.history_key(update_name), message)
+            with alert_stats_lock:
+                alert_stats["announced"] += len(alerts)
+            if voice_path and os.path.exists(voice_path):
+                os.remove(voice_path)
 
 
 def main():
+    portals = load_portals("portals.json")
+    if DEBUG:
+        for portal in portals:
+            portal.scheduler.interval = portal.scheduler.hot_interval = WAIT
+    migrate_legacy_history(portals)
+    for portal in portals:
+        portal.snapshot = load_snapshot(portal.snapshot_path)
+    for store in (history, latest_updates):
+        store.on_flush = lambda duration, store=store: metrics.record_span(
+            "history_flush", duration, store=store.path
+        )
+    history.start()
+    latest_updates.start()
+    # Only the "sqlite" history knows when the updates were seen, so it can seed the learned hot hours
+    if hasattr(history, "seen_times"):
+        for portal in portals:
+            portal.scheduler.learn(history.seen_times(f"{portal.name}/"))
+    simple_log(
+        f"Watching {len(portals)} portal(s): {', '.join(p.name for p in portals)}"
+    )
+
+    Thread(target=prepare_template_clips, args=(portals,), daemon=True).start()
+    status_reporter = StatusReporter(
+        bot,
+        OWNER_TELEGRAM_ID,
+        snapshot=lambda: get_status_snapshot(portals),
+        min_interval=STATUS_MIN_INTERVAL,
+        max_interval=STATUS_MAX_INTERVAL,
+    )
+    Thread(target=status_reporter.run, daemon=True).start()
+    register_bot_commands(portals)
+    try:
+        bot.set_bot_commands_info()
+    except Exception as E:
+        simple_log(f"Error while setting the commands of the bot: {E}")
+    if TELEGRAM_WEBHOOK_URL:
+        Thread(
+            target=bot.start_webhook,
+            kwargs={"url": TELEGRAM_WEBHOOK_URL, "port": TELEGRAM_WEBHOOK_PORT},
+            daemon=True,
+        ).start()
+    else:
+        Thread(target=bot.start_polling, daemon=True).start()
+    simple_log(f"{len(subscribers)} subscriber(s)")
+    if METRICS_ENABLED and METRICS_PORT:
+        try:
+            metrics.serve(port=METRICS_PORT)
+            simple_log(f"Metrics available on http://127.0.0.1:{METRICS_PORT}/metrics")
+        except OSError as E:
+            simple_log(f"Error while starting the metrics server: {E}")
+    Thread(target=announce_updates, daemon=True).start()
+    Thread(target=play_updates, daemon=True).start()
+    executor = ThreadPoolExecutor(
+        max_workers=len(portals), thread_name_prefix="portal"
+    )  # One worker per portal, so a slow portal never delays the others
+    in_flight = {}  # Portals which are being checked right now
+
     simple_log("Main Loop Started!")
     while True:
         try:
-            simple_log("Checking for updates...")
-            LATEST_UPDATES = get_updates_from_website()
-            UNNOTIFIED_UPDATES = get_unique_updates(LATEST_UPDATES)
-            for update_name, update_messages in UNNOTIFIED_UPDATES.items():
-                for message in update_messages:
-                    now = datetime.now()
-                    current_hour = int(now.hour)
-                    if (current_hour > 8) and (current_hour < 23):
-                        create_txt_to_speech_message(update_name, message)
-                        play_voice_message()
-                    set_last_checked(update_name, message)
-                    sleep(3)
-            cleanup_old_updates()
-            sleep(WAIT)
+            for name, future in list(in_flight.items()):
+                if future.done():
+                    del in_flight[name]
+            for portal in portals:
+                if (portal.name not in in_flight) and (time() >= portal.next_poll):
+                    in_flight[portal.name] = executor.submit(check_portal, portal)
+            sleep(1)
         except KeyboardInterrupt:
             simple_log("Stopping Main Loop...")
+            status_reporter.stop()
+            executor.shutdown(wait=False, cancel_futures=True)
+            history.close()
+            latest_updates.close()
             simple_log("Exiting Program...")
+            metrics.close()
             break
         except Exception as E:
             simple_log(f"Main Loop Error: {E}")
-            sleep(WAIT + 30)
+            sleep(30)
 
 
 if __name__ == "__main__":
-    Thread(target=send_telegram_updates).start()
     simple_log("Starting Main Loop...")
     main()
     simple_log("Main Loop stopped! Program stopped!")
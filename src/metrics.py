@@ -0,0 +1,353 @@
+"""
+Metrics - Timing spans, counters and histograms of the program
+====================================================================================================
+
+The stages of a poll (fetching, parsing, comparing with the history, saving it, synthesizing and playing the
+voice messages) and the calls to the Telegram Bot API are timed with spans:
+
+    with metrics.span("fetch", portal=portal.name):
+        response = portal_client.get(portal.url)
+
+Every span adds its duration to the "<name>_seconds" histogram and, if a log file is set, writes a JSON line
+with its name, labels, duration and error. The log is rotated (to "<path>.1") when it reaches its size limit. The counters and histograms can be read in the Prometheus text
+format from a small HTTP server on a local port (see Metrics.serve()).
+
+A disabled Metrics object does nothing: its spans are a shared object which doesn't even read the clock.
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+import os
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps
+from threading import Lock, Thread, local
+from time import perf_counter, time
+
+# Upper bounds (in seconds) of the buckets of the histograms
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class _NullSpan:
+    """
+    Internal class of the spans of a disabled Metrics object. Don't use.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """
+    Internal class which times a block of code. Don't use.
+    """
+
+    __slots__ = ("metrics", "name", "labels", "start", "parent")
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        stack = self.metrics._stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self.name)
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = perf_counter() - self.start
+        self.metrics._stack().pop()
+        self.metrics.record_span(
+            self.name,
+            duration,
+            error=exc_value,
+            parent=self.parent,
+            **self.labels,
+        )
+        return False
+
+
+class _Histogram:
+    """
+    Internal class which counts the observed values in buckets. Don't use.
+    """
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.counts = [0] * (len(buckets) + 1)  # The last one is "+Inf"
+        self.sum = 0.0
+        self.count = 0
+
+
+def _label_key(labels):
+    """
+    Internal function which returns a hashable key of the labels. Don't use.
+    """
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    """
+    Internal function which returns the labels in the Prometheus format, like {portal="fe2025"}. Don't use.
+    """
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Metrics:
+    def __init__(
+        self,
+        enabled: bool = True,
+        log_path: str = None,
+        prefix: str = "cet_notifier",
+        buckets: tuple = DEFAULT_BUCKETS,
+        max_log_bytes: int = 5 * 1024 * 1024,
+    ):
+        """
+        Registry of the counters and histograms of the program
+        :param enabled: Set it to False to turn off all the metrics (the spans and counters then do nothing)
+        :param log_path: Path of the file to which the spans and events are appended as JSON lines. Nothing is logged if it is None
+        :param prefix: Prefix of the names of the metrics in the Prometheus format
+        :param buckets: Upper bounds (in seconds) of the buckets of the histograms
+        :param max_log_bytes: Size of the log file at which it is moved to "<log_path>.1" (replacing the older one)
+        """
+        self.enabled = enabled
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self._lock = Lock()
+        self._counters = {}  # (name, label key) -> value
+        self._histograms = {}  # (name, label key) -> _Histogram
+        self._local = local()  # The names of the open spans of every thread
+        self.log_path = log_path
+        self.max_log_bytes = max_log_bytes
+        self._log_file = None
+        self._log_bytes = 0
+        if enabled and log_path:
+            self._log_file = open(log_path, "a", encoding="utf-8")
+            self._log_bytes = self._log_file.tell()
+        self.server = None
+
+    def _stack(self):
+        """
+        Internal function which returns the open spans of the current thread. Don't use.
+        """
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, name: str, **labels):
+        """
+        Returns a context manager which times the code run inside it
+        :param name: The name of the span, like "fetch"
+        :param labels: The labels of the span, like portal="fe2025"
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, labels)
+
+    def record_span(
+        self, name: str, duration: float, error=None, parent: str = None, **labels
+    ):
+        """
+        Record a span timed somewhere else (like the API calls of the bot)
+        :param name: The name of the span
+        :param duration: The duration in seconds
+        :param error: The exception raised in the span, if any
+        :param parent: The name of the span in which it was run, if any
+        :param labels: The labels of the span
+        """
+        if not self.enabled:
+            return
+        self.observe(f"{name}_seconds", duration, **labels)
+        if error is not None:
+            self.inc(f"{name}_errors_total", **labels)
+        if self._log_file is not None:
+            self.write_log(
+                {
+                    "time": time(),
+                    "span": name,
+                    "duration": round(duration, 6),
+                    "parent": parent,
+                    "error": None if error is None else str(error),
+                    "labels": labels,
+                }
+            )
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """
+        Increase a counter
+        :param name: The name of the counter, like "alerts_total"
+        :param value: The amount to add
+        :param labels: The labels of the counter
+        """
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        Add a value to a histogram
+        :param name: The name of the histogram, like "fetch_seconds"
+        :param value: The observed value
+        :param labels: The labels of the histogram
+        """
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.counts[bisect_left(self.buckets, value)] += 1
+            histogram.sum += value
+            histogram.count += 1
+
+    def event(self, name: str, **fields):
+        """
+        Write a structured event (like a log message) to the JSON lines log
+        :param name: The name of the event, like "log"
+        :param fields: The fields of the event
+        """
+        if self._log_file is None:
+            return
+        self.write_log({"time": time(), "event": name, **fields})
+
+    def write_log(self, record: dict):
+        """
+        Append a record to the JSON lines log
+        :param record: The record
+        """
+        line = dumps(record, default=str) + "\n"
+        with self._lock:
+            if self._log_file is None:
+                return
+            self._log_file.write(line)
+            self._log_bytes += len(line)
+            if self._log_bytes >= self.max_log_bytes:
+                self._rotate_log()
+
+    def _rotate_log(self):
+        """
+        Internal function which moves the full log to "<log_path>.1" and starts a new one. Don't use.
+        """
+        self._log_file.close()
+        os.replace(self.log_path, f"{self.log_path}.1")
+        self._log_file = open(self.log_path, "a", encoding="utf-8")
+        self._log_bytes = 0
+
+    def snapshot(self):
+        """
+        Returns a copy of the counters and histograms as {"counters": {...}, "histograms": {...}}
+        """
+        with self._lock:
+            return {
+                "counters": {
+                    name + _format_labels(key): value
+                    for (name, key), value in self._counters.items()
+                },
+                "histograms": {
+                    name
+                    + _format_labels(key): {
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                    }
+                    for (name, key), histogram in self._histograms.items()
+                },
+            }
+
+    def render_prometheus(self):
+        """
+        Returns the counters and histograms in the Prometheus text format
+        """
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, key), value in sorted(self._counters.items()):
+                full_name = f"{self.prefix}_{name}"
+                if full_name not in typed:
+                    lines.append(f"# TYPE {full_name} counter")
+                    typed.add(full_name)
+                lines.append(f"{full_name}{_format_labels(key)} {value}")
+            for (name, key), histogram in sorted(self._histograms.items()):
+                full_name = f"{self.prefix}_{name}"
+                if full_name not in typed:
+                    lines.append(f"# TYPE {full_name} histogram")
+                    typed.add(full_name)
+                cumulative = 0
+                for bound, bucket_count in zip(
+                    self.buckets + ("+Inf",), histogram.counts
+                ):
+                    cumulative += bucket_count
+                    labels = _format_labels(key, [("le", str(bound))])
+                    lines.append(f"{full_name}_bucket{labels} {cumulative}")
+                lines.append(f"{full_name}_sum{_format_labels(key)} {histogram.sum}")
+                lines.append(
+                    f"{full_name}_count{_format_labels(key)} {histogram.count}"
+                )
+        return "\n".join(lines) + "\n"
+
+    def serve(self, host: str = "127.0.0.1", port: int = 9108):
+        """
+        Start an HTTP server which returns the metrics in the Prometheus text format on "/metrics"
+        :param host: The address on which the server listens (only this device by default)
+        :param port: The port on which the server listens (0 to use any free port)
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass  # Every scrape would be printed otherwise
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = metrics.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        Thread(
+            target=self.server.serve_forever, name="metrics-server", daemon=True
+        ).start()
+        return self.server
+
+    def close(self):
+        """
+        Stop the HTTP server and close the log file
+        """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self._log_file is not None:
+            with self._lock:
+                self._log_file.close()
+                self._log_file = None
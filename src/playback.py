@@ -0,0 +1,207 @@
+"""
+Playback - The backends used to play the voice messages
+====================================================================================================
+
+Every backend has a blocking play() function which returns once the clip has finished playing. The
+completion is detected by waiting for the player process or on an event, instead of starting a
+"termux-media-player info" process every 100 ms:
+
+- "termux": Uses "play-audio" (a blocking player from the Termux packages) when it is installed. Otherwise uses
+  "termux-media-player", waits for the duration of the clip (read from the MP3 frame headers) and checks once
+  that it has stopped
+- "mpg123": Runs mpg123 (or aplay for WAV clips) and waits for it to exit (used on computers, while debugging)
+- "null": Plays nothing, only records the played clips (for running the program headless)
+- "file": Copies every played clip to a directory, so it can be checked later
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+import os
+import shutil
+import subprocess
+import wave
+from json import loads
+from threading import Event
+
+# Bitrates (kbps) of MPEG Layer III, indexed by [MPEG-1?][bitrate index]
+MP3_BITRATES = {
+    True: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    False: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MP3_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG-1
+    2: [22050, 24000, 16000],  # MPEG-2
+    0: [11025, 12000, 8000],  # MPEG-2.5
+}
+
+
+def mp3_duration(path: str):
+    """
+    Returns the duration (in seconds) of a MP3 file by reading the headers of all its frames
+    :param path: Path of the file
+    """
+    data = open(path, "rb").read()
+    position = 0
+    if data[:3] == b"ID3":  # Skip the ID3v2 tag
+        position = 10 + ((data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9])
+
+    duration = 0.0
+    while position + 4 <= len(data):
+        header = int.from_bytes(data[position : position + 4], "big")
+        version = (header >> 19) & 0b11
+        layer = (header >> 17) & 0b11
+        bitrate_index = (header >> 12) & 0b1111
+        sample_rate_index = (header >> 10) & 0b11
+        if (
+            (header >> 21) != 0b11111111111  # Frame sync
+            or version == 1  # Reserved
+            or layer != 0b01  # Layer III
+            or bitrate_index in (0, 15)
+            or sample_rate_index == 3
+        ):
+            position += 1  # Not a frame header, look for the next one
+            continue
+        is_mpeg_1 = version == 3
+        bitrate = MP3_BITRATES[is_mpeg_1][bitrate_index] * 1000
+        sample_rate = MP3_SAMPLE_RATES[version][sample_rate_index]
+        padding = (header >> 9) & 1
+        samples = 1152 if is_mpeg_1 else 576
+        position += (samples // 8) * bitrate // sample_rate + padding
+        duration += samples / sample_rate
+    return duration
+
+
+def clip_duration(path: str):
+    """
+    Returns the duration (in seconds) of a MP3 or WAV clip
+    :param path: Path of the clip
+    """
+    if path.endswith(".wav"):
+        with wave.open(path, "rb") as clip:
+            return clip.getnframes() / clip.getframerate()
+    return mp3_duration(path)
+
+
+class PlaybackBackend:
+    name = "base"
+
+    def __init__(self):
+        """
+        Parent class of the playback backends
+        """
+        self._stop = Event()
+        self.played = 0
+
+    def play(self, path: str):
+        """
+        Play a clip and return once it has finished playing
+        :param path: Path of the clip
+        """
+        self._stop.clear()
+        self._play(path)
+        self.played += 1
+
+    def _play(self, path):
+        raise NotImplementedError
+
+    def stop(self):
+        """
+        Stop waiting for the clip which is being played
+        """
+        self._stop.set()
+
+
+class TermuxBackend(PlaybackBackend):
+    name = "termux"
+
+    def __init__(self, margin: float = 0.5):
+        """
+        Plays the clips on Android using the Termux packages
+        :param margin: Extra seconds to wait after the duration of a clip played by termux-media-player
+        """
+        super().__init__()
+        self.margin = margin
+        self.blocking_player = shutil.which("play-audio")
+
+    def _is_playing(self):
+        try:
+            result = subprocess.run(
+                ["termux-media-player", "info"], capture_output=True, text=True
+            )
+            return loads(result.stdout).get("status") != "stopped"
+        except Exception:
+            return False
+
+    def _play(self, path):
+        if self.blocking_player:
+            subprocess.run([self.blocking_player, path])
+            return
+
+        subprocess.run(["termux-media-player", "play", path], capture_output=True)
+        self._stop.wait(clip_duration(path) + self.margin)
+        while self._is_playing() and not self._stop.is_set():
+            self._stop.wait(0.5)  # Only reached if the clip is longer than expected
+
+
+class Mpg123Backend(PlaybackBackend):
+    name = "mpg123"
+
+    def _play(self, path):
+        if path.endswith(".wav"):  # Made by the offline synthesis engine
+            subprocess.run(["aplay", "-q", path])
+        else:
+            subprocess.run(["mpg123", "-q", path])
+
+
+class NullBackend(PlaybackBackend):
+    name = "null"
+
+    def __init__(self):
+        """
+        Plays nothing, only records the paths of the played clips
+        """
+        super().__init__()
+        self.history = []
+
+    def _play(self, path):
+        self.history.append(path)
+
+
+class FileSinkBackend(PlaybackBackend):
+    name = "file"
+
+    def __init__(self, directory: str = "played"):
+        """
+        Copies every played clip to a directory
+        :param directory: The directory
+        """
+        super().__init__()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _play(self, path):
+        shutil.copyfile(
+            path,
+            os.path.join(
+                self.directory, f"{self.played + 1:05d}_{os.path.basename(path)}"
+            ),
+        )
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (TermuxBackend, Mpg123Backend, NullBackend, FileSinkBackend)
+}
+
+
+def get_playback_backend(name: str, **kwargs):
+    """
+    Returns an object of the chosen playback backend
+    :param name: The name of the backend
+    """
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Invalid playback backend, please choose one from the list: {list(BACKENDS.keys())}"
+        )
+    return BACKENDS[name](**kwargs)
@@ -0,0 +1,163 @@
+"""
+Portal Client - Pooled HTTP client used to fetch the CET Cell portal pages
+====================================================================================================
+
+Built the same way as the session of the TelegramBot class: one requests Session which keeps the
+connections alive, negotiates compression and never waits forever on a stalled connection.
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+from collections import deque
+from email.utils import parsedate_to_datetime
+from random import randint, uniform
+from threading import Lock
+from time import perf_counter, sleep, time
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+
+try:
+    import brotli  # noqa: F401 (only needed by urllib3 to decode "br" responses)
+
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ModuleNotFoundError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def parse_retry_after(value: str):
+    """
+    Returns the number of seconds asked by a "Retry-After" header (a number of seconds or a date), or None
+    :param value: The value of the header
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+    except (TypeError, ValueError):
+        return None
+
+
+class PortalClient:
+    def __init__(
+        self,
+        connect_timeout: float = 5,
+        read_timeout: float = 20,
+        retries: int = 3,
+        backoff: float = 1,
+        max_backoff: float = 30,
+        pool_size: int = 4,
+    ):
+        """
+        Pooled HTTP client used to fetch the portal pages
+        :param connect_timeout: Seconds to wait for the connection (and the TLS handshake) to be made
+        :param read_timeout: Seconds to wait for the server to send the next bytes of the response
+        :param retries: Number of times a failed request is retried
+        :param backoff: Base delay (in seconds) of the exponential backoff between the retries
+        :param max_backoff: Maximum delay (in seconds) between two retries
+        :param pool_size: Number of connections kept alive per host
+        """
+        self.session = Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(
+            {
+                "user-agent": f"Device {randint(100, 999)}",
+                "accept-encoding": ACCEPT_ENCODING,
+                "connection": "keep-alive",
+            }
+        )
+
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._lock = Lock()
+        self._latencies = deque(maxlen=100)  # Latency of the most recent requests
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "failures": 0,
+            "last_latency": None,
+        }
+
+    def _record(self, latency):
+        """
+        Internal function to save the latency of a request. Don't use.
+        """
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["last_latency"] = latency
+            self._latencies.append(latency)
+
+    def _wait_before_retry(self, attempt, retry_after=None):
+        """
+        Internal function to sleep before the next retry using the "full jitter" backoff, but at least as long
+        as the server asked with its "Retry-After" header. Don't use.
+        """
+        with self._lock:
+            self.stats["retries"] += 1
+        delay = uniform(0, min(self.max_backoff, self.backoff * (2**attempt)))
+        sleep(max(delay, retry_after or 0))
+
+    def _failed(self):
+        """
+        Internal function to count a request which failed after all its retries. Don't use.
+        """
+        with self._lock:
+            self.stats["failures"] += 1
+
+    def get(self, url: str, headers: dict = None):
+        """
+        Send a GET request, retrying on connection errors and temporary server errors
+        :param url: The URL to fetch
+        :param headers: Extra headers to send along with the default headers of the session
+        """
+        for attempt in range(self.retries + 1):
+            start = perf_counter()
+            retry_after = None
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+                self._record(perf_counter() - start)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                retry_after = parse_retry_after(response.headers.get("retry-after"))
+                # The response is returned if the server asks to wait longer than the maximum backoff
+                if (attempt == self.retries) or (
+                    (retry_after is not None) and (retry_after > self.max_backoff)
+                ):
+                    self._failed()
+                    return response
+            except RequestException:
+                self._record(perf_counter() - start)
+                if attempt == self.retries:
+                    self._failed()
+                    raise
+            self._wait_before_retry(attempt, retry_after)
+
+    def latency_stats(self):
+        """
+        Returns the latency statistics (in seconds) of the most recent requests
+        """
+        with self._lock:
+            samples = sorted(self._latencies)
+            stats = dict(self.stats)
+        if not samples:
+            return {**stats, "min": None, "avg": None, "p95": None, "max": None}
+        return {
+            **stats,
+            "min": samples[0],
+            "avg": sum(samples) / len(samples),
+            "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+            "max": samples[-1],
+        }
@@ -0,0 +1,148 @@
+"""
+Portals - The list of CET Cell portals watched by the program
+====================================================================================================
+
+Every portal has its own URL, polling interval, history namespace and parsing profile. The portals
+are read from the "portals.json" file, which is a list of objects like:
+
+    {"name": "fe2025", "title": "FE 2025", "url": "https://...", "interval": 180, "profile": "mahacet",
+     "hot_interval": 45, "hot_windows": ["17:00-21:00"]}
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+from json import loads, decoder as json_decoder
+
+from scheduler import AdaptiveScheduler
+
+# Parsing profiles describe where the updates are found on the page of a portal
+PROFILES = {
+    "mahacet": {
+        "cards": [
+            "News",
+            "Notifications",
+            "Downloads",
+        ],  # Names of the "card-body" sections, in the order they appear on the page
+        "important": "Important",  # Name of the "important-text" section
+        "buttons": "Buttons",  # Name of the buttons of the "LeftMenu" section
+        "replace_terms": {"MH": "Maharashtra", "AI": "All India"},
+    },
+}
+
+DEFAULT_PORTALS = [
+    {
+        "name": "fe2025",
+        "title": "FE 2025",
+        "url": "https://fe2025.mahacet.org/StaticPages/HomePage",
+        "interval": 180,
+        "profile": "mahacet",
+        "legacy_history": True,
+    }
+]
+
+
+class Portal:
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        title: str = "",
+        interval: float = 180,
+        profile: str = "mahacet",
+        legacy_history: bool = False,
+        hot_interval: float = 45,
+        hot_windows: list = [],
+    ):
+        """
+        A CET Cell portal watched by the program
+        :param name: Unique name of the portal, also used as the namespace of its history
+        :param url: The URL of the page which contains the updates
+        :param title: The name of the portal used in the voice messages
+        :param interval: Normal number of seconds to wait between two polls
+        :param profile: Name of the parsing profile (see PROFILES)
+        :param legacy_history: Set it to True if the portal should take over the history saved before the namespaces existed
+        :param hot_interval: Number of seconds to wait between two polls in the hot windows and after a change
+        :param hot_windows: List of the daily windows in which updates are expected, like ["17:00-21:00"]
+        """
+        if profile not in PROFILES:
+            raise ValueError(
+                f"Invalid profile name, please choose one from the list: {list(PROFILES.keys())}"
+            )
+        self.name = name
+        self.url = url
+        self.title = title or name
+        self.profile_name = profile
+        self.profile = PROFILES[profile]
+        self.legacy_history = legacy_history
+
+        # Validators and the hash of the last parsed page, used to skip unchanged polls
+        self.etag = None
+        self.last_modified = None
+        self.body_hash = None
+        # The items of the sections of the page seen in the last poll (see snapshot.py)
+        self.snapshot = None
+
+        self.scheduler = AdaptiveScheduler(
+            interval=interval, hot_interval=hot_interval, hot_windows=hot_windows
+        )
+        self.last_error = None  # The error of the last poll, if it failed
+        self.stats = {
+            "polls": 0,
+            "not_modified": 0,  # The server answered with "304 Not Modified"
+            "unchanged": 0,  # The page was downloaded but its hash matched the last one
+            "changed": 0,
+            "errors": 0,
+            "last_fetch_latency": None,  # Seconds taken by the last request of the page
+            "last_parse_time": None,  # Seconds taken to parse the page the last time it changed
+        }
+
+    @property
+    def next_poll(self):
+        """
+        Returns the time (from time.time()) of the next poll
+        """
+        return self.scheduler.next_poll
+
+    @property
+    def categories(self):
+        """
+        Returns the names of all the update categories of the portal
+        """
+        return self.profile["cards"] + [
+            self.profile["important"],
+            self.profile["buttons"],
+        ]
+
+    @property
+    def snapshot_path(self):
+        """
+        Returns the path of the file in which the snapshot of the page is saved
+        """
+        return f"snapshot_{self.name}.json"
+
+    def history_key(self, category: str):
+        """
+        Returns the key under which the history of a category of this portal is saved
+        :param category: The name of the category
+        """
+        return f"{self.name}/{category}"
+
+
+def load_portals(path: str = "portals.json"):
+    """
+    Returns the list of portals saved in the given file, or the default portal if the file doesn't exist
+    :param path: Path of the file
+    """
+    try:
+        portals_info = loads(open(path, "r").read())
+    except FileNotFoundError:
+        portals_info = DEFAULT_PORTALS
+    except json_decoder.JSONDecodeError as E:
+        raise ValueError(f"Invalid portals file '{path}': {E}")
+
+    portals = [Portal(**info) for info in portals_info]
+    names = [portal.name for portal in portals]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Portal names must be unique: {names}")
+    return portals
@@ -0,0 +1,145 @@
+"""
+pyTelegramBot - Dispatcher File
+====================================================================================================
+
+This file contains the dispatcher which runs the update handlers (the command functions, text input
+functions and action functions of the inline keyboard inputs) on a pool of worker threads, so a slow
+handler doesn't stop the bot from receiving the other updates.
+
+The updates of the same chat are handled one after the other, in the order they were received. The
+updates of different chats are handled in parallel. When too many updates are waiting, submit() blocks
+until some of them are handled, so the polling loop stops asking Telegram for more.
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Semaphore
+from time import perf_counter
+from traceback import print_exc
+
+
+class Dispatcher:
+    def __init__(self, handler, workers: int = 4, max_pending: int = 100):
+        """
+        Runs the handler of every update on a pool of worker threads
+        :param handler: The function which handles a single update
+        :param workers: Number of updates handled at the same time
+        :param max_pending: Maximum number of updates waiting or being handled before submit() blocks
+        """
+        self.handler = handler
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="telegram-handler"
+        )
+        self._slots = Semaphore(max_pending)
+        self._lock = Lock()
+        # Chat ID -> deque of the updates of the chat waiting to be handled
+        self._chats = {}
+        self._pending = 0
+        # Handler latency of the most recent updates
+        self._latencies = deque(maxlen=200)
+        self.stats = {
+            "submitted": 0,
+            "handled": 0,
+            "failed": 0,
+            "max_pending": 0,
+            "backpressure_waits": 0,
+        }
+
+    @staticmethod
+    def chat_of(update):
+        """
+        Returns the ID of the chat of an update, used to keep the order of the updates of a chat
+        :param update: The update
+        """
+        chat_id = getattr(update, "chat_id", None)
+        if chat_id is None and hasattr(update, "from_user"):
+            # Callback queries without a message are kept in order by the user who sent them
+            chat_id = getattr(update.from_user, "id", None)
+        return chat_id
+
+    def submit(self, update):
+        """
+        Queue an update to be handled. Blocks while "max_pending" updates are waiting
+        :param update: The update
+        """
+        chat_id = self.chat_of(update)
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats["backpressure_waits"] += 1
+            self._slots.acquire()
+
+        with self._lock:
+            self.stats["submitted"] += 1
+            self._pending += 1
+            self.stats["max_pending"] = max(self.stats["max_pending"], self._pending)
+            if chat_id in self._chats:  # A worker is already handling this chat
+                self._chats[chat_id].append(update)
+                return
+            self._chats[chat_id] = deque([update])
+        try:
+            self._executor.submit(self._drain, chat_id)
+        except BaseException:
+            # The updates of the chat will never be handled, so their slots are given back
+            with self._lock:
+                updates = self._chats.pop(chat_id)
+                self._pending -= len(updates)
+            self._slots.release(len(updates))
+            raise
+
+    def _drain(self, chat_id):
+        """
+        Internal function which handles the updates of a chat in order until none is left. Don't use.
+        """
+        while True:
+            with self._lock:
+                updates = self._chats[chat_id]
+                if not updates:
+                    del self._chats[chat_id]
+                    return
+                update = updates.popleft()
+
+            start = perf_counter()
+            failed = False
+            try:
+                self.handler(update)
+            except Exception as E:
+                failed = True
+                print(f"pyTelegramBot > Update Handling Exception: {E}")
+                print_exc()
+            latency = perf_counter() - start
+
+            with self._lock:
+                self._pending -= 1
+                self._latencies.append(latency)
+                self.stats["failed" if failed else "handled"] += 1
+            self._slots.release()
+
+    def metrics(self):
+        """
+        Returns the queue depth and the handler latency (in seconds) statistics
+        """
+        with self._lock:
+            samples = sorted(self._latencies)
+            metrics = {
+                **self.stats,
+                "pending": self._pending,
+                "active_chats": len(self._chats),
+            }
+        if not samples:
+            return {**metrics, "avg_latency": None, "p95_latency": None}
+        return {
+            **metrics,
+            "avg_latency": sum(samples) / len(samples),
+            "p95_latency": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        }
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop the workers
+        :param wait: Set it to False to return without waiting for the queued updates to be handled
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
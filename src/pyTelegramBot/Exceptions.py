@@ -15,3 +15,24 @@ class InsufficientDataException(Exception):
     """
 
     pass
+
+
+class WebhookException(Exception):
+    """
+    Raised when the webhook can't be set
+    """
+
+    pass
+
+
+class TelegramAPIError(Exception):
+    """
+    Raised when the Telegram API answers with an error (only by the functions called with raise_on_error=True)
+    """
+
+    def __init__(self, response: dict):
+        self.response = response
+        self.error_code = response.get("error_code")
+        self.description = response.get("description", "Unknown error")
+        self.retry_after = response.get("parameters", {}).get("retry_after")
+        super().__init__(f"{self.error_code}: {self.description}")
@@ -0,0 +1,389 @@
+"""
+pyTelegramBot - Mock Server File
+====================================================================================================
+
+This file contains a small local server which behaves like the Telegram Bot API, to test and benchmark a bot
+without a real bot token or the network:
+
+    server = MockTelegramServer().start()
+    bot = TelegramBot("TEST", api_url=server.api_url)
+    server.push_command(chat_id=1, command="start")
+
+It implements "getUpdates" (with long polling and offsets), "sendMessage", "editMessageText",
+"editMessageReplyMarkup", "answerCallbackQuery" and "sendPhoto", and accepts the other methods used by the
+wrapper ("getMe", "getChat", "setMyCommands", ...). The updates received by the bot are added with the
+push_*() functions and the requests it sends are recorded with the time they arrived. The server can also
+add latency to the responses and answer a part of the requests with "429 Too Many Requests" errors.
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from json import dumps, loads, decoder as json_decoder
+from random import Random
+from threading import Condition, Thread
+from time import monotonic, sleep, time
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Mock Bot", "username": "mock_bot"}
+# The methods which can get "429 Too Many Requests" errors, i.e., the ones which send or edit messages
+RATE_LIMITED_METHODS = {
+    "sendMessage",
+    "sendPhoto",
+    "editMessageText",
+    "editMessageReplyMarkup",
+}
+
+
+def _parse_form(content_type, body):
+    """
+    Internal function which returns the text fields of a "multipart/form-data" body (the files are skipped). Don't use.
+    """
+    form = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + body
+    )
+    fields = {}
+    for part in form.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        if (name is not None) and (part.get_filename() is None):
+            value = part.get_payload(decode=True).decode()
+            fields[name] = int(value) if value.lstrip("-").isdigit() else value
+    return fields
+
+
+class _MockRequestHandler(BaseHTTPRequestHandler):
+    """
+    Internal class which handles the requests of the mock server. Don't use.
+    """
+
+    protocol_version = "HTTP/1.1"  # Keeps the connections alive, like Telegram
+    # The headers and the body are sent in separate writes, which would wait for the delayed ACKs otherwise
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass  # Every request would be printed otherwise
+
+    def _respond(self, status, body):
+        data = dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        received = monotonic()
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        method = self.path.rstrip("/").rsplit("/", 1)[-1]
+        content_type = self.headers.get("Content-Type", "")
+        payload = {}
+        try:
+            if content_type.startswith("application/json"):
+                payload = loads(body or b"{}")
+            elif content_type.startswith("multipart/form-data"):
+                payload = _parse_form(content_type, body)
+        except (ValueError, json_decoder.JSONDecodeError):
+            return self._respond(
+                400, server.error(400, "Bad Request: can't parse the parameters")
+            )
+        status, response = server.handle(method, payload, received)
+        self._respond(status, response)
+
+
+class MockTelegramServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0,
+        rate_limit_probability: float = 0,
+        retry_after: int = 1,
+        seed: int = None,
+    ):
+        """
+        Local server which behaves like the Telegram Bot API
+        :param host: The address on which the server listens
+        :param port: The port on which the server listens (0 to use any free port)
+        :param latency: Seconds added to the response of every request (except the long polling wait)
+        :param rate_limit_probability: Part of the requests sending or editing messages (0-1) answered with a "429 Too Many Requests" error
+        :param retry_after: The "retry_after" time (in seconds) sent with the 429 errors
+        :param seed: Seed of the random numbers deciding which requests are rate limited
+        """
+        super().__init__((host, port), _MockRequestHandler)
+        self.latency = latency
+        self.rate_limit_probability = rate_limit_probability
+        self.retry_after = retry_after
+        self._random = Random(seed)
+
+        self._condition = Condition()
+        self._updates = []  # The updates not confirmed by the bot yet, in order
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._query_ids = count(1)
+        self._messages = {}  # (chat ID, message ID) -> message dictionary
+        # Every request which wasn't rate limited, as (monotonic time, method, payload)
+        self.requests = []
+        self.stats = {"requests": 0, "rate_limited": 0}
+        self._stopped = False
+
+    @property
+    def api_url(self):
+        """
+        Returns the URL to use as the "api_url" of a TelegramBot
+        """
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def start(self):
+        """
+        Start the server on a background thread
+        """
+        Thread(
+            target=self.serve_forever, name="telegram-mock-server", daemon=True
+        ).start()
+        return self
+
+    def stop(self):
+        """
+        Stop the server
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()  # Ends the long polling requests
+        self.shutdown()
+        self.server_close()
+
+    @staticmethod
+    def error(code: int, description: str, retry_after: int = None):
+        """
+        Returns the JSON response of an error of the Telegram Bot API
+        :param code: The error code, like 400
+        :param description: The description of the error
+        :param retry_after: The "retry_after" time of a 429 error
+        """
+        response = {"ok": False, "error_code": code, "description": description}
+        if retry_after is not None:
+            response["parameters"] = {"retry_after": retry_after}
+        return response
+
+    def handle(self, method: str, payload: dict, received: float = None):
+        """
+        Returns the HTTP status and the JSON response of a request to the API
+        :param method: The name of the method, like "sendMessage"
+        :param payload: The parameters of the method
+        :param received: The time (from time.monotonic()) at which the request arrived
+        """
+        with self._condition:
+            self.stats["requests"] += 1
+            self.stats[method] = self.stats.get(method, 0) + 1
+            rate_limited = (method in RATE_LIMITED_METHODS) and (
+                self._random.random() < self.rate_limit_probability
+            )
+            if rate_limited:
+                self.stats["rate_limited"] += 1
+            else:
+                self.requests.append((received or monotonic(), method, payload))
+        if self.latency:
+            sleep(self.latency)
+        if rate_limited:
+            return 429, self.error(
+                429,
+                f"Too Many Requests: retry after {self.retry_after}",
+                self.retry_after,
+            )
+
+        if method == "getUpdates":
+            return 200, {"ok": True, "result": self._get_updates(payload)}
+        if method in ("sendMessage", "sendPhoto"):
+            return 200, {"ok": True, "result": self._new_message(method, payload)}
+        if method in ("editMessageText", "editMessageReplyMarkup"):
+            return self._edit_message(method, payload)
+        if method == "getMe":
+            return 200, {"ok": True, "result": BOT_USER}
+        if method == "getChat":
+            return 200, {
+                "ok": True,
+                "result": {"id": payload.get("chat_id"), "type": "private"},
+            }
+        if method in (
+            "answerCallbackQuery",
+            "setMyCommands",
+            "deleteMyCommands",
+            "setWebhook",
+            "deleteWebhook",
+        ):
+            return 200, {"ok": True, "result": True}
+        return 404, self.error(404, "Not Found")
+
+    def _get_updates(self, payload):
+        """
+        Internal function which returns the updates requested with "getUpdates", waiting for them if there are none. Don't use.
+        """
+        offset = payload.get("offset") or 0
+        limit = payload.get("limit") or 100
+        deadline = monotonic() + (payload.get("timeout") or 0)
+        with self._condition:
+            while True:
+                # The updates before the offset are confirmed, so they are never sent again
+                if offset < 0:
+                    self._updates = self._updates[offset:]
+                else:
+                    self._updates = [
+                        update
+                        for update in self._updates
+                        if update["update_id"] >= offset
+                    ]
+                remaining = deadline - monotonic()
+                if self._updates or (remaining <= 0) or self._stopped:
+                    return self._updates[:limit]
+                self._condition.wait(remaining)
+
+    def _new_message(self, method, payload):
+        """
+        Internal function which returns the message sent with "sendMessage" or "sendPhoto". Don't use.
+        """
+        with self._condition:
+            message_id = self._next_message_id
+            self._next_message_id += 1
+            message = {
+                "message_id": message_id,
+                "date": int(time()),
+                "from": BOT_USER,
+                "chat": {"id": payload.get("chat_id"), "type": "private"},
+            }
+            if method == "sendPhoto":
+                message["photo"] = [{"file_id": f"photo-{message_id}", "width": 1}]
+                message["caption"] = payload.get("caption", "")
+            else:
+                message["text"] = payload.get("text", "")
+            if "reply_markup" in payload:
+                message["reply_markup"] = payload["reply_markup"]
+            self._messages[(message["chat"]["id"], message_id)] = message
+        return message
+
+    def _edit_message(self, method, payload):
+        """
+        Internal function which edits a message sent before, like "editMessageText" does. Don't use.
+        """
+        with self._condition:
+            message = self._messages.get(
+                (payload.get("chat_id"), payload.get("message_id"))
+            )
+            if message is None:
+                return 400, self.error(400, "Bad Request: message to edit not found")
+            if method == "editMessageText":
+                if message.get("text") == payload.get("text"):
+                    return 400, self.error(
+                        400,
+                        "Bad Request: message is not modified: specified new message content and reply markup are "
+                        "exactly the same as a current content and reply markup of the message",
+                    )
+                message["text"] = payload.get("text", "")
+            elif "reply_markup" in payload:
+                message["reply_markup"] = payload["reply_markup"]
+            else:
+                message.pop("reply_markup", None)
+            return 200, {"ok": True, "result": dict(message)}
+
+    def push_update(self, update: dict):
+        """
+        Add an update to be received by the bot and return its update ID. The "update_id" is added to it
+        :param update: The dictionary of the update without the "update_id", like {"message": {...}}
+        """
+        with self._condition:
+            update = {"update_id": self._next_update_id, **update}
+            self._next_update_id += 1
+            self._updates.append(update)
+            self._condition.notify_all()
+        return update["update_id"]
+
+    @staticmethod
+    def _user(user_id):
+        """
+        Internal function which returns the dictionaries of a user and its private chat. Don't use.
+        """
+        user = {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"}
+        return user, {
+            "id": user_id,
+            "type": "private",
+            "first_name": user["first_name"],
+        }
+
+    def push_message(self, chat_id: int, text: str):
+        """
+        Add a text message sent by a user to the bot in their private chat and return its update ID
+        :param chat_id: The ID of the chat (the same as the ID of the user)
+        :param text: The text of the message
+        """
+        user, chat = self._user(chat_id)
+        with self._condition:
+            message_id = self._next_message_id
+            self._next_message_id += 1
+        message = {
+            "message_id": message_id,
+            "date": int(time()),
+            "from": user,
+            "chat": chat,
+            "text": text,
+        }
+        if text.startswith("/"):
+            command_length = len(text.split()[0])
+            message["entities"] = [
+                {"type": "bot_command", "offset": 0, "length": command_length}
+            ]
+        return self.push_update({"message": message})
+
+    def push_command(self, chat_id: int, command: str):
+        """
+        Add a command sent by a user to the bot and return its update ID
+        :param chat_id: The ID of the chat
+        :param command: The name of the command, like "start"
+        """
+        return self.push_message(chat_id, f"/{command}")
+
+    def push_callback_query(self, chat_id: int, message: dict, data: str):
+        """
+        Add a press of a button of an inline keyboard and return its update ID
+        :param chat_id: The ID of the chat
+        :param message: The dictionary of the message which has the inline keyboard
+        :param data: The callback data of the button (like "menu_1")
+        """
+        user, _ = self._user(chat_id)
+        return self.push_update(
+            {
+                "callback_query": {
+                    "id": str(next(self._query_ids)),
+                    "from": user,
+                    "message": message,
+                    "chat_instance": str(chat_id),
+                    "data": data,
+                }
+            }
+        )
+
+    def clear(self):
+        """
+        Forget the recorded requests and the sent messages (they can't be edited anymore), so a long test doesn't keep them all
+        """
+        with self._condition:
+            self.requests = []
+            self._messages = {}
+
+    def sent_messages(self, chat_id=None):
+        """
+        Returns the requests of the messages sent by the bot (as (time, method, payload)), optionally to a single chat
+        :param chat_id: The ID of the chat
+        """
+        with self._condition:
+            return [
+                request
+                for request in self.requests
+                if request[1] in ("sendMessage", "sendPhoto")
+                and ((chat_id is None) or (request[2].get("chat_id") == chat_id))
+            ]
@@ -0,0 +1,266 @@
+"""
+pyTelegramBot - Send Queue File
+====================================================================================================
+
+This file contains the outbound queue used to send the messages of the bot. Telegram limits the number of
+messages a bot can send (about 30 per second in total and about 1 per second to the same chat) and answers
+with a "429 Too Many Requests" error and a "retry_after" time when the limits are exceeded.
+
+The queue sends the requests from a few worker threads at the highest permitted rate, using a token bucket
+for all the chats together and one for every chat. A request which gets a 429 error is sent again after the
+"retry_after" time. Every request has a priority and the requests with a higher priority (like alerts) are
+sent before the others (like status message edits). The requests to the same chat with the same priority are
+sent in the order they were queued.
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+from concurrent.futures import Future
+from heapq import heappop, heappush
+from itertools import count
+from threading import Condition, Thread
+from time import monotonic
+
+from pyTelegramBot.Exceptions import TelegramAPIError
+
+# Priority lanes of the requests, a lower value is sent first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        """
+        Token bucket rate limiter
+        :param rate: Number of tokens added per second
+        :param capacity: Maximum number of tokens, i.e., the size of the burst allowed after a pause
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = monotonic()
+
+    def _refill(self, now):
+        """
+        Internal function to add the tokens earned since the last update. Don't use.
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float):
+        """
+        Returns the number of seconds to wait before a token is available
+        :param now: The current time (from time.monotonic())
+        """
+        self._refill(now)
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        """
+        Take a token
+        :param now: The current time (from time.monotonic())
+        """
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float):
+        """
+        Returns True if the bucket is full, i.e., it wasn't used recently
+        :param now: The current time (from time.monotonic())
+        """
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _Chat:
+    def __init__(self, rate, capacity):
+        """
+        Internal class which stores the queued requests and the rate limit of a chat. Don't use.
+        """
+        self.queue = []  # Heap of (priority, sequence number, request)
+        self.bucket = TokenBucket(rate, capacity)
+        self.blocked_until = 0  # Set after a 429 error
+        self.active = False  # True while the chat is scheduled, ready or sending
+
+
+class SendQueue:
+    def __init__(
+        self,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        chat_burst: float = 1,
+        workers: int = 8,
+        max_retries: int = 5,
+    ):
+        """
+        Rate limited queue of the outbound requests
+        :param global_rate: Maximum number of requests sent per second to all the chats together
+        :param chat_rate: Maximum number of requests sent per second to the same chat
+        :param chat_burst: Number of requests which can be sent at once to a chat which was idle
+        :param workers: Number of requests sent at the same time
+        :param max_retries: Number of times a request is sent again after a 429 error
+        """
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+
+        self._condition = Condition()
+        # No burst for all the chats together, so the requests are evenly spaced and no second is over the limit
+        self._global = TokenBucket(global_rate, 1)
+        self._chats = {}  # Chat ID -> _Chat
+        # Heap of (time at which the chat can send, sequence number, chat ID)
+        self._timers = []
+        # Heap of (priority, sequence number, chat ID) of the chats which can send now
+        self._ready = []
+        self._sequence = count()
+        self._closed = False
+        self._sending = 0  # Number of requests being sent right now
+        self.stats = {"queued": 0, "sent": 0, "rate_limited": 0, "failed": 0}
+
+        self._workers = [
+            Thread(target=self._work, name=f"telegram-send-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, chat_id, send, priority: int = PRIORITY_NORMAL):
+        """
+        Queue a request and return a Future of its parsed JSON response
+        :param chat_id: The ID of the chat the request is sent to
+        :param send: Function which sends the request and returns the parsed JSON response
+        :param priority: One of PRIORITY_HIGH, PRIORITY_NORMAL and PRIORITY_LOW
+        """
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("The send queue is closed")
+            chat = self._chats.get(chat_id)
+            if chat is None:
+                chat = self._chats[chat_id] = _Chat(self.chat_rate, self.chat_burst)
+            heappush(chat.queue, (priority, next(self._sequence), [send, future, 0]))
+            self.stats["queued"] += 1
+            if not chat.active:
+                self._schedule(chat_id, chat, monotonic())
+            self._condition.notify()
+        return future
+
+    def _schedule(self, chat_id, chat, now):
+        """
+        Internal function to schedule the next request of a chat once its rate limit allows it. Don't use.
+        """
+        chat.active = True
+        ready_at = max(now + chat.bucket.wait_time(now), chat.blocked_until)
+        heappush(self._timers, (ready_at, next(self._sequence), chat_id))
+
+    def _next_request(self):
+        """
+        Internal function which waits for a request which can be sent and takes it out of the queue. Don't use.
+        """
+        with self._condition:
+            while True:
+                now = monotonic()
+                while self._timers and self._timers[0][0] <= now:
+                    _, sequence, chat_id = heappop(self._timers)
+                    priority = self._chats[chat_id].queue[0][0]
+                    heappush(self._ready, (priority, sequence, chat_id))
+
+                timeout = (self._timers[0][0] - now) if self._timers else None
+                if self._ready:
+                    global_wait = self._global.wait_time(now)
+                    if global_wait == 0:
+                        break
+                    timeout = (
+                        global_wait if timeout is None else min(timeout, global_wait)
+                    )
+                elif self._closed and not (self._timers or self._sending):
+                    return None
+                self._condition.wait(timeout)
+
+            _, _, chat_id = heappop(self._ready)
+            chat = self._chats[chat_id]
+            priority, sequence, request = heappop(chat.queue)
+            self._global.take(now)
+            chat.bucket.take(now)
+            self._sending += 1
+            return chat_id, chat, priority, sequence, request
+
+    def _work(self):
+        """
+        Internal function run by the worker threads. Don't use.
+        """
+        while True:
+            item = self._next_request()
+            if item is None:
+                return
+            chat_id, chat, priority, sequence, request = item
+            send, future, attempts = request
+            response, error = None, None
+            try:
+                response = send()
+            except Exception as E:
+                error = E
+                # Raised by the requests sent with raise_on_error=True, retried like the other responses
+                if isinstance(E, TelegramAPIError):
+                    response = E.response
+
+            retry_after = None
+            if isinstance(response, dict) and response.get("error_code") == 429:
+                retry_after = response.get("parameters", {}).get("retry_after", 1)
+
+            with self._condition:
+                now = monotonic()
+                if (retry_after is not None) and (attempts < self.max_retries):
+                    self.stats["rate_limited"] += 1
+                    request[2] += 1
+                    chat.blocked_until = now + retry_after
+                    heappush(chat.queue, (priority, sequence, request))
+                    future = None  # Not done yet
+                elif error is not None:
+                    self.stats["failed"] += 1
+                else:
+                    self.stats["sent"] += 1
+
+                self._sending -= 1
+                chat.active = False
+                if chat.queue:
+                    self._schedule(chat_id, chat, now)
+                elif len(self._chats) > 1000:
+                    self._forget_idle_chats(now)
+                self._condition.notify_all()
+
+            if future is not None:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(response)
+
+    def _forget_idle_chats(self, now):
+        """
+        Internal function to remove the chats which have nothing to send and weren't used recently. Don't use.
+        """
+        for chat_id, chat in list(self._chats.items()):
+            if (
+                (not chat.active)
+                and (not chat.queue)
+                and (chat.blocked_until <= now)
+                and chat.bucket.is_full(now)
+            ):
+                del self._chats[chat_id]
+
+    def pending(self):
+        """
+        Returns the number of requests waiting to be sent
+        """
+        with self._condition:
+            return sum(len(chat.queue) for chat in self._chats.values())
+
+    def close(self):
+        """
+        Stop the workers once the queued requests are sent
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
@@ -0,0 +1,152 @@
+"""
+pyTelegramBot - Webhook File
+====================================================================================================
+
+This file contains the small HTTP server which receives the updates when the bot uses a webhook instead
+of polling. Telegram sends every update as a JSON POST request with the secret token of the webhook in
+the "X-Telegram-Bot-Api-Secret-Token" header. The requests without the right token are rejected.
+
+Telegram only sends the updates to HTTPS URLs, so the server is usually put behind a reverse proxy (or a
+tunnel) which handles the TLS connections.
+
+The replay_updates() function sends recorded updates to a webhook server the same way Telegram does, to
+test the bot without Telegram.
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+from collections import deque
+from hmac import compare_digest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import loads, decoder as json_decoder
+from threading import Lock
+
+from requests import Session
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class _WebhookRequestHandler(BaseHTTPRequestHandler):
+    """
+    Internal class which handles the requests of the webhook server. Don't use.
+    """
+
+    def log_message(self, format, *args):
+        pass  # Every update would be printed otherwise
+
+    def _respond(self, status):
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        server = self.server
+        if self.path.split("?")[0] != server.path:
+            return self._respond(404)
+        if server.secret_token and not compare_digest(
+            self.headers.get(SECRET_TOKEN_HEADER, ""), server.secret_token
+        ):
+            server.count("rejected")
+            return self._respond(403)
+        try:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            result = loads(body)
+            update_id = result["update_id"]
+        except (ValueError, KeyError, TypeError, json_decoder.JSONDecodeError):
+            server.count("invalid")
+            return self._respond(400)
+
+        # Telegram sends an update again if it didn't get the response
+        if server.is_duplicate(update_id):
+            return self._respond(200)
+        # Blocks while the dispatcher is full, so Telegram waits and sends the next updates later
+        server.submit(server.parse_update(result))
+        server.count("received")
+        self._respond(200)
+
+    def do_GET(self):
+        self._respond(405)
+
+
+class WebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        parse_update,
+        submit,
+        host: str = "0.0.0.0",
+        port: int = 8443,
+        path: str = "/",
+        secret_token: str = None,
+    ):
+        """
+        HTTP server which receives the updates sent by Telegram to the webhook
+        :param parse_update: Function which returns the object of an update from its dictionary
+        :param submit: Function which queues an update to be handled (the submit function of the dispatcher)
+        :param host: The address on which the server listens
+        :param port: The port on which the server listens (0 to use any free port)
+        :param path: The path of the URL to which the updates are sent
+        :param secret_token: The secret token of the webhook. The requests aren't checked if it is None
+        """
+        super().__init__((host, port), _WebhookRequestHandler)
+        self.parse_update = parse_update
+        self.submit = submit
+        self.path = path
+        self.secret_token = secret_token
+
+        self._lock = Lock()
+        # IDs of the last updates, to skip the ones sent again
+        self._recent_ids = deque(maxlen=1000)
+        self._recent_set = set()
+        self.stats = {"received": 0, "duplicates": 0, "rejected": 0, "invalid": 0}
+
+    def count(self, name):
+        """
+        Increase a counter of the stats
+        :param name: The name of the counter
+        """
+        with self._lock:
+            self.stats[name] += 1
+
+    def is_duplicate(self, update_id):
+        """
+        Returns True if the update was already received, otherwise remembers it
+        :param update_id: The ID of the update
+        """
+        with self._lock:
+            if update_id in self._recent_set:
+                self.stats["duplicates"] += 1
+                return True
+            if len(self._recent_ids) == self._recent_ids.maxlen:
+                self._recent_set.discard(self._recent_ids[0])
+            self._recent_ids.append(update_id)
+            self._recent_set.add(update_id)
+            return False
+
+    @property
+    def url(self):
+        """
+        Returns the local URL of the server
+        """
+        host, port = self.server_address[:2]
+        if host == "0.0.0.0":
+            host = "127.0.0.1"
+        return f"http://{host}:{port}{self.path}"
+
+
+def replay_updates(url: str, updates: list, secret_token: str = None):
+    """
+    Send recorded updates to a webhook server like Telegram does and return the HTTP status codes of the responses
+    :param url: The URL of the webhook server
+    :param updates: List of the dictionaries of the updates (as received from "getUpdates" or a webhook)
+    :param secret_token: The secret token of the webhook
+    """
+    headers = {SECRET_TOKEN_HEADER: secret_token} if secret_token else {}
+    statuses = []
+    with Session() as session:
+        for update in updates:
+            response = session.post(url, json=update, headers=headers, timeout=10)
+            statuses.append(response.status_code)
+    return statuses
@@ -21,4 +21,7 @@ from pyTelegramBot.pyTelegramBot import (
     InlineKeyboardInput,
     InlineKeyboardButton,
 )
+from pyTelegramBot.SendQueue import PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+from pyTelegramBot.Webhook import replay_updates
+from pyTelegramBot.MockServer import MockTelegramServer
 import pyTelegramBot.Exceptions
@@ -9,18 +9,45 @@ add more.
 Author: @Sid72020123 on Github
 """
 
-from json import dumps
+from secrets import token_urlsafe
 from requests import Session
-from requests.exceptions import ConnectionError
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout
+from time import perf_counter, sleep
 from traceback import print_exc
 
-from pyTelegramBot.Exceptions import InsufficientDataException
+from pyTelegramBot.Dispatcher import Dispatcher
+from pyTelegramBot.Exceptions import (
+    InsufficientDataException,
+    TelegramAPIError,
+    WebhookException,
+)
+from pyTelegramBot.SendQueue import SendQueue, PRIORITY_NORMAL
+from pyTelegramBot.Webhook import WebhookServer
 
 # Official Telegram Bot API Documentation: https://core.telegram.org/bots/api
 TELEGRAM_API_URL = "https://api.telegram.org/bot"
 
+# Methods which can safely be sent again if the request failed, as sending them twice has the same effect as once
+IDEMPOTENT_METHODS = {
+    "getUpdates",
+    "getChat",
+    "editMessageText",
+    "editMessageReplyMarkup",
+    "setMyCommands",
+    "deleteMyCommands",
+}
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+
+# The update classes below only keep the dictionary received from the Telegram API (and use __slots__ instead
+# of an instance __dict__). Their attributes are read from that dictionary when they are used, so an update
+# costs only what the handlers actually use
+
 
 class User:
+    __slots__ = ("user_dict", "bot_object")
+
     def __init__(self, user_dict, bot_object):
         """
         Telegram user class used internally by the program
@@ -30,30 +57,52 @@ class User:
         self.user_dict = user_dict
         self.bot_object = bot_object
 
-        self.id = user_dict["id"]
-        self.is_bot = user_dict.get("is_bot", None)
-        self.first_name = user_dict.get("first_name", "")
-        self.last_name = user_dict.get("last_name", "")
-        self.username = user_dict.get("username", None)
+    @property
+    def id(self):
+        return self.user_dict["id"]
+
+    @property
+    def is_bot(self):
+        return self.user_dict.get("is_bot", None)
+
+    @property
+    def first_name(self):
+        return self.user_dict.get("first_name", "")
+
+    @property
+    def last_name(self):
+        return self.user_dict.get("last_name", "")
+
+    @property
+    def username(self):
+        return self.user_dict.get("username", None)
 
     def send_message(
-        self, message: str, parse_mode: str = "HTML", disable_wpp: bool = True
+        self,
+        message: str,
+        parse_mode: str = "HTML",
+        disable_wpp: bool = True,
+        priority: int = PRIORITY_NORMAL,
     ):
         """
         Send a message to the user
         :param message: The message to send
         :param parse_mode: The way the message should be parsed by the Telegram API
         :param disable_wpp: Change the behavior of "disable_web_page_preview" provided by the Telegram API
+        :param priority: The priority of the message in the send queue
         """
         return self.bot_object.send_message(
             chat_id=self.id,
             message=message,
             parse_mode=parse_mode,
             disable_wpp=disable_wpp,
+            priority=priority,
         )
 
 
 class Message:
+    __slots__ = ("message_dict", "bot_object", "_from_user")
+
     def __init__(self, message_dict, bot_object):
         """
         Telegram message class used internally by the program
@@ -62,32 +111,58 @@ class Message:
         """
         self.message_dict = message_dict
         self.bot_object = bot_object
-
-        self._update(message_dict)
+        self._from_user = None  # Made the first time it is used
 
     def _update(self, message_dict):
         """
         Internal function to update the class attributes. Don't use.
         """
-        self.id = message_dict["message_id"]
-        self.date = message_dict["date"]
-        self.text = message_dict["text"]
-        self.entities = message_dict.get("entities", None)
-        self.from_user = User(message_dict["from"], self.bot_object)
-        self.chat = message_dict["chat"]
-        self.chat_id = self.chat["id"]
+        self.message_dict = message_dict
+        self._from_user = None
+
+    @property
+    def id(self):
+        return self.message_dict["message_id"]
+
+    @property
+    def date(self):
+        return self.message_dict["date"]
+
+    @property
+    def text(self):
+        return self.message_dict.get("text", None)  # Not sent for media messages
+
+    @property
+    def entities(self):
+        return self.message_dict.get("entities", None)
+
+    @property
+    def from_user(self):
+        if self._from_user is None:
+            self._from_user = User(self.message_dict["from"], self.bot_object)
+        return self._from_user
+
+    @property
+    def chat(self):
+        return self.message_dict["chat"]
+
+    @property
+    def chat_id(self):
+        return self.message_dict["chat"]["id"]
 
     def edit(
         self,
         message: str,
         parse_mode: str = "HTML",
         disable_wpp: bool = True,
+        priority: int = PRIORITY_NORMAL,
     ):
         """
         Edit the Telegram message
         :param message: The new text of the message to be edited
         :param parse_mode: The way the message should be parsed by the Telegram API
         :param disable_wpp: Change the behavior of "disable_web_page_preview" provided by the Telegram API
+        :param priority: The priority of the edit in the send queue
         """
         response = self.bot_object.edit_message(
             chat_id=self.chat_id,
@@ -95,6 +170,7 @@ class Message:
             message=message,
             parse_mode=parse_mode,
             disable_wpp=disable_wpp,
+            priority=priority,
         )
         if response["ok"]:
             self._update(response["result"])
@@ -151,6 +227,8 @@ class InlineKeyboardInput:
 
 
 class CallbackQuery:
+    __slots__ = ("query_dict", "bot_object", "_from_user", "_message")
+
     def __init__(self, query_dict, bot_object):
         """
         Telegram callback query update class used internally by the program
@@ -159,16 +237,48 @@ class CallbackQuery:
         """
         self.query_dict = query_dict
         self.bot_object = bot_object
+        self._from_user = None  # Both are made the first time they are used
+        self._message = None
+
+    @property
+    def id(self):
+        return self.query_dict["id"]
+
+    @property
+    def from_user(self):
+        if self._from_user is None:
+            self._from_user = User(self.query_dict["from"], self.bot_object)
+        return self._from_user
 
-        self.id = query_dict["id"]
-        self.from_user = User(query_dict["from"], bot_object)
-        self.message = Message(query_dict["message"], bot_object)
-        self.data = str(query_dict["data"])
+    @property
+    def message(self):
+        if self._message is None:
+            self._message = Message(self.query_dict["message"], self.bot_object)
+        return self._message
 
-        self.input_name = self.data.split("_")[0]  # The name of the input
-        self.input_data = self.data[
-            self.data.index("_") + 1 :
-        ]  # The name of the data (or the ID of button pressed) of that particular input
+    @property
+    def chat_id(self):
+        if "message" not in self.query_dict:
+            return None  # The buttons of the inline mode messages have no message
+        return self.query_dict["message"]["chat"]["id"]
+
+    @property
+    def data(self):
+        return str(self.query_dict["data"])
+
+    @property
+    def input_name(self):
+        """
+        The name of the input
+        """
+        return self.data.partition("_")[0]
+
+    @property
+    def input_data(self):
+        """
+        The name of the data (or the ID of button pressed) of that particular input
+        """
+        return self.data.partition("_")[2]
 
     def answer_callback(self):
         """
@@ -187,14 +297,45 @@ class CallbackQuery:
 
 
 class TelegramBot:
-    def __init__(self, token):
+    def __init__(
+        self,
+        token,
+        polling_timeout: int = 30,
+        polling_limit: int = 100,
+        handler_workers: int = 4,
+        max_pending_updates: int = 100,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        pool_size: int = 16,
+        connect_timeout: float = 5,
+        read_timeout: float = 15,
+        retries: int = 3,
+        api_url: str = TELEGRAM_API_URL,
+    ):
         """
         The main class to manage your Telegram Bot
         :param token: The bot token of your bot
+        :param polling_timeout: Seconds for which Telegram holds a "getUpdates" request open while there are no updates (long polling)
+        :param polling_limit: Maximum number of updates received in one "getUpdates" request (1-100)
+        :param handler_workers: Number of updates handled at the same time (the updates of a chat are always handled in order)
+        :param max_pending_updates: Maximum number of updates waiting to be handled before the polling pauses
+        :param global_rate: Maximum number of messages sent per second to all the chats together
+        :param chat_rate: Maximum number of messages sent per second to the same chat
+        :param pool_size: Number of connections to Telegram kept alive
+        :param connect_timeout: Seconds to wait for the connection to Telegram to be made
+        :param read_timeout: Seconds to wait for the response of Telegram (added to the long polling timeout for "getUpdates")
+        :param retries: Number of times a failed request of an idempotent method is sent again
+        :param api_url: The URL of the Telegram Bot API to which the token is added, like "http://127.0.0.1:8081/bot" for a local (or mock) server
         """
         self.session = Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
         self.bot_token = token
-        self.api_url = f"{TELEGRAM_API_URL}{token}"
+        self.api_url = f"{api_url}{token}"
 
         self.commands = {}  # Used to store the command functions
         self.commands_help_text = {}  # Used to store the command help texts
@@ -217,64 +358,187 @@ class TelegramBot:
             "incorrect_command": None,  # the command which doesn't exist is being used
         }  # Used by "events" feature
 
-        self.update_offset = 0
-        self.get_updates(first_offset=True)  # Required for storing the first offset
+        self.polling_timeout = polling_timeout
+        self.polling_limit = polling_limit
+        self.dispatcher = Dispatcher(
+            self.process_update,
+            workers=handler_workers,
+            max_pending=max_pending_updates,
+        )  # Runs the handlers of the updates on a pool of worker threads
+        # Sends the messages within the rate limits of Telegram
+        self.send_queue = SendQueue(global_rate=global_rate, chat_rate=chat_rate)
+        # Found by the first "getUpdates" request, so making the object doesn't need the network
+        self.update_offset = None
+        self.webhook_server = None
+        # Called after every API request with the method, its duration in seconds and the error (None if it succeeded)
+        self.on_api_call = None
+
+    def call(
+        self,
+        method: str,
+        payload: dict = None,
+        files: dict = None,
+        read_timeout: float = None,
+        raise_on_error: bool = False,
+    ):
+        """
+        Send a request to the Telegram Bot API and return its parsed JSON response. The parameters are sent as a
+        JSON body (or as a multipart form when files are uploaded). The requests of the idempotent methods are
+        sent again after connection errors and server errors
+        :param method: The name of the method, like "sendMessage"
+        :param payload: The parameters of the method
+        :param files: Dictionary of the files to upload, like {"photo": <opened file>}
+        :param read_timeout: Seconds to wait for the response. Uses "read_timeout" by default
+        :param raise_on_error: Set it to True to raise a TelegramAPIError (instead of returning the response) if the API answers with an error
+        """
+        timeout = (
+            self.connect_timeout,
+            self.read_timeout if read_timeout is None else read_timeout,
+        )
+        retries = self.retries if method in IDEMPOTENT_METHODS else 0
+        start = perf_counter()
+        error = None
+        try:
+            for attempt in range(retries + 1):
+                try:
+                    if files is None:
+                        response = self.session.post(
+                            f"{self.api_url}/{method}",
+                            json=payload or {},
+                            timeout=timeout,
+                        )
+                    else:
+                        for file in files.values():
+                            file.seek(0)
+                        response = self.session.post(
+                            f"{self.api_url}/{method}",
+                            data=payload,
+                            files=files,
+                            timeout=timeout,
+                        )
+                    if (response.status_code not in RETRY_STATUS_CODES) or (
+                        attempt == retries
+                    ):
+                        result = response.json()
+                        if not result.get("ok", False):
+                            error = result.get("description", "Unknown error")
+                            if raise_on_error:
+                                raise TelegramAPIError(result)
+                        return result
+                except (ConnectionError, Timeout):
+                    if attempt == retries:
+                        raise
+                sleep(min(10, 0.5 * (2**attempt)))
+        except Exception as E:
+            error = E
+            raise
+        finally:
+            if self.on_api_call is not None:
+                self.on_api_call(method, perf_counter() - start, error)
 
     def get_updates(
         self,
         offset=None,
-        timeout: int = 3,
-        limit: int = 10,
+        timeout: int = None,
+        limit: int = None,
         first_offset: bool = False,
     ):
         """
         Get the updates the bot receives from the Telegram Bot API
         :param offset: The offset of the update
-        :param timeout: The timeout
-        :param limit: The limit of the updates
+        :param timeout: Seconds to wait for an update if there is none (long polling). Uses "polling_timeout" by default
+        :param limit: The limit of the updates. Uses "polling_limit" by default
         :param first_offset: Set it to True if you want to get the offset of the most recent update
         """
+        if (offset is None) and (self.update_offset is None) and (not first_offset):
+            self.get_updates(first_offset=True)  # Required for storing the first offset
+        timeout = self.polling_timeout if timeout is None else timeout
+        limit = self.polling_limit if limit is None else limit
+        if first_offset:
+            timeout = 0  # Don't wait while starting
         request_offset = offset
         if offset is None:
             request_offset = self.update_offset
             if first_offset:
                 request_offset = -1  # Get the most recent update
 
-        response = self.session.get(
-            f"{self.api_url}/getUpdates",
-            params={"limit": limit, "offset": request_offset, "timeout": timeout},
+        # Telegram holds the request open for "timeout" seconds
+        response_json = self.call(
+            "getUpdates",
+            {"limit": limit, "offset": request_offset, "timeout": timeout},
+            read_timeout=timeout + self.read_timeout,
         )
-        response_json = response.json()
         if first_offset or (offset is None):
             if response_json["ok"] and len(response_json["result"]) > 0:
+                # Move past the newest update of the batch, so none of them is received again
                 self.update_offset = (
-                    response_json["result"][0]["update_id"] + 1
-                )  # Increase the offset by 1 to check for the next update
-        results = response_json["result"]
-        updates = []
-        for result in results:
-            if "message" in result:
-                updates.append(Message(result["message"], self))
-            elif "callback_query" in result:
-                updates.append(CallbackQuery(result["callback_query"], self))
-            else:
-                updates.append(
-                    result
-                )  # Only the two types of updates ("message" and "callback_query") are processed here. The rest are returned. This can also be changed.
-        return updates
+                    max(result["update_id"] for result in response_json["result"]) + 1
+                )
+            elif self.update_offset is None:
+                self.update_offset = 0
+        return [self.parse_update(result) for result in response_json["result"]]
+
+    def parse_update(self, result: dict):
+        """
+        Returns the object of an update received from the Telegram API (by polling or by the webhook)
+        :param result: The dictionary of the update
+        """
+        if "message" in result:
+            return Message(result["message"], self)
+        elif "callback_query" in result:
+            return CallbackQuery(result["callback_query"], self)
+        return result  # Only the two types of updates ("message" and "callback_query") are processed here. The rest are returned. This can also be changed.
 
     def get_user_info(self, id: int):
         """
         Returns the information about a Telegram user
         :param id: The ID of the chat
         """
-        response = self.session.get(f"{self.api_url}/getChat?chat_id={id}").json()
+        response = self.call("getChat", {"chat_id": id})
         if response["ok"]:
             return User(response["result"], self)
         return response
 
+    def queue_request(
+        self,
+        chat_id,
+        method: str,
+        payload: dict,
+        priority: int = PRIORITY_NORMAL,
+        files=None,
+        raise_on_error: bool = False,
+    ):
+        """
+        Send a request to a chat through the send queue and return its parsed JSON response. The request waits
+        for the rate limits and is sent again after a "429 Too Many Requests" error
+        :param chat_id: The ID of the chat
+        :param method: The name of the Telegram Bot API method, like "sendMessage"
+        :param payload: The parameters of the method
+        :param priority: One of PRIORITY_HIGH, PRIORITY_NORMAL and PRIORITY_LOW
+        :param files: Function which opens and returns the files to upload (they are opened again on every retry)
+        :param raise_on_error: Set it to True to raise a TelegramAPIError if the API answers with an error
+        """
+
+        def send():
+            if files is None:
+                return self.call(method, payload, raise_on_error=raise_on_error)
+            opened = files()
+            try:
+                return self.call(method, payload, opened, raise_on_error=raise_on_error)
+            finally:
+                for file in opened.values():
+                    file.close()
+
+        return self.send_queue.submit(chat_id, send, priority).result()
+
     def send_message(
-        self, chat_id, message: str, parse_mode: str = "HTML", disable_wpp: bool = True
+        self,
+        chat_id,
+        message: str,
+        parse_mode: str = "HTML",
+        disable_wpp: bool = True,
+        priority: int = PRIORITY_NORMAL,
+        raise_on_error: bool = False,
     ):
         """
         Sends the message to a chat ID
@@ -282,16 +546,18 @@ class TelegramBot:
         :param message: The message to be sent
         :param parse_mode: The way the message should be parsed by the Telegram API
         :param disable_wpp: Change the behavior of "disable_web_page_preview" provided by the Telegram API
+        :param priority: The priority of the message in the send queue
+        :param raise_on_error: Set it to True to raise a TelegramAPIError instead of returning the failed response
         """
-        response = self.session.get(
-            f"{self.api_url}/sendMessage",
-            params={
-                "chat_id": chat_id,
-                "parse_mode": parse_mode,
-                "text": message,
-                "disable_web_page_preview": disable_wpp,
-            },
-        ).json()
+        payload = {
+            "chat_id": chat_id,
+            "parse_mode": parse_mode,
+            "text": message,
+            "disable_web_page_preview": disable_wpp,
+        }
+        response = self.queue_request(
+            chat_id, "sendMessage", payload, priority, raise_on_error=raise_on_error
+        )
         if response["ok"]:
             return Message(response["result"], self)
         else:
@@ -304,6 +570,7 @@ class TelegramBot:
         iki: InlineKeyboardInput,
         parse_mode: str = "HTML",
         disable_wpp: bool = True,
+        priority: int = PRIORITY_NORMAL,
     ):
         """
         Send the inline keyboard input as reply markup along with the message
@@ -312,41 +579,43 @@ class TelegramBot:
         :param iki: An object of the InlineKeyboardInput class
         :param parse_mode: The way the message should be parsed by the Telegram API
         :param disable_wpp: Change the behavior of "disable_web_page_preview" provided by the Telegram API
+        :param priority: The priority of the message in the send queue
         """
         payload = {
             "chat_id": chat_id,
             "parse_mode": parse_mode,
             "text": message,
             "disable_web_page_preview": disable_wpp,
-            "reply_markup": dumps({"inline_keyboard": iki.buttons}),
+            "reply_markup": {"inline_keyboard": iki.buttons},
         }
         self.inline_keyboard_inputs[iki.name] = iki
-        response = self.session.get(
-            f"{self.api_url}/sendMessage", params=payload
-        ).json()
+        response = self.queue_request(chat_id, "sendMessage", payload, priority)
         if response["ok"]:
             return Message(response["result"], self)
         else:
             return response
 
-    def edit_inline_keyboard_input(self, chat_id, message_id, iki: InlineKeyboardInput):
+    def edit_inline_keyboard_input(
+        self,
+        chat_id,
+        message_id,
+        iki: InlineKeyboardInput,
+        priority: int = PRIORITY_NORMAL,
+    ):
         """
         Edit the input of the inline keyboard
         :param chat_id: The ID of the chat
         :param message_id: The message ID which has a reply markup of inline keyboard
         :param iki: An object of the InlineKeyboardInput class
+        :param priority: The priority of the edit in the send queue
         """
-        payload = {
-            "chat_id": chat_id,
-            "message_id": message_id,
-            "reply_markup": dumps({"inline_keyboard": iki.buttons}),
-        }
-        if len(iki.buttons) == 0:
-            payload["reply_markup"] = {}  # Remove all the buttons if its empty
+        payload = {"chat_id": chat_id, "message_id": message_id}
+        if len(iki.buttons) > 0:  # All the buttons are removed if it is empty
+            payload["reply_markup"] = {"inline_keyboard": iki.buttons}
         self.inline_keyboard_inputs[iki.name] = iki
-        response = self.session.get(
-            f"{self.api_url}/editMessageReplyMarkup", params=payload
-        ).json()
+        response = self.queue_request(
+            chat_id, "editMessageReplyMarkup", payload, priority
+        )
         if response["ok"]:
             return Message(response["result"], self)
         else:
@@ -357,10 +626,9 @@ class TelegramBot:
         Just answer the query, i.e., let the client/user know that the bot/program has received the input and is still processing further tasks
         :param query_id: The ID of the query
         """
-        data = {"callback_query_id": query_id}
-        return self.session.get(
-            f"{self.api_url}/answerCallbackQuery", data=data
-        ).json()["result"]
+        return self.call("answerCallbackQuery", {"callback_query_id": query_id})[
+            "result"
+        ]
 
     def send_photo(
         self,
@@ -371,6 +639,7 @@ class TelegramBot:
         parse_mode: str = "HTML",
         show_caption_above: bool = False,
         has_spoiler: bool = False,
+        priority: int = PRIORITY_NORMAL,
     ):
         """
         Sends a photo message to a chat ID. Make sure to provide at least one of the "from_url" and "from_file" parameters
@@ -381,6 +650,7 @@ class TelegramBot:
         :param parse_mode: The way the message/caption should be parsed by the Telegram API
         :param show_caption_above: Set it to True if you want the image caption to be displayed above the image
         :param has_spoiler: Set it to True if you want the image to be sent as a "spoiler" message
+        :param priority: The priority of the message in the send queue
         """
         payload = {
             "chat_id": chat_id,
@@ -392,14 +662,15 @@ class TelegramBot:
         response = {}
         if from_url is not None:
             payload["photo"] = from_url
-            response = self.session.post(
-                f"{self.api_url}/sendPhoto", data=payload
-            ).json()
+            response = self.queue_request(chat_id, "sendPhoto", payload, priority)
         elif from_file is not None:
-            with open(from_file, "rb") as file:
-                response = self.session.post(
-                    f"{self.api_url}/sendPhoto", data=payload, files={"photo": file}
-                ).json()
+            response = self.queue_request(
+                chat_id,
+                "sendPhoto",
+                payload,
+                priority,
+                files=lambda: {"photo": open(from_file, "rb")},
+            )
         else:
             raise InsufficientDataException(
                 "One of the 'from_url' or 'from_file' variables should be provided!"
@@ -413,6 +684,8 @@ class TelegramBot:
         message: str,
         parse_mode: str = "HTML",
         disable_wpp: bool = True,
+        priority: int = PRIORITY_NORMAL,
+        raise_on_error: bool = False,
     ):
         """
         Edit the Telegram message
@@ -421,6 +694,8 @@ class TelegramBot:
         :param message: The new text of the message to be edited
         :param parse_mode: The way the message should be parsed by the Telegram API
         :param disable_wpp: Change the behavior of "disable_web_page_preview" provided by the Telegram API
+        :param priority: The priority of the edit in the send queue
+        :param raise_on_error: Set it to True to raise a TelegramAPIError instead of returning the failed response
         """
         payload = {
             "chat_id": chat_id,
@@ -429,9 +704,13 @@ class TelegramBot:
             "text": message,
             "disable_web_page_preview": disable_wpp,
         }
-        return self.session.get(
-            f"{self.api_url}/editMessageText", params=payload
-        ).json()  # Directly parsed JSON is returned here...
+        return self.queue_request(
+            chat_id,
+            "editMessageText",
+            payload,
+            priority,
+            raise_on_error=raise_on_error,
+        )  # Directly parsed JSON is returned here...
 
     def on_command(
         self,
@@ -470,7 +749,7 @@ class TelegramBot:
         """
         payload = {}
         if command_info:
-            payload["commands"] = dumps(command_info)
+            payload["commands"] = command_info
         else:
             info = []
             for command_name, command_description in self.commands_help_text.items():
@@ -480,14 +759,14 @@ class TelegramBot:
                         "description": command_description.strip(),
                     }
                 )
-            payload["commands"] = dumps(info)
-        return self.session.get(f"{self.api_url}/setMyCommands", params=payload).json()
+            payload["commands"] = info
+        return self.call("setMyCommands", payload)
 
     def delete_bot_commands_info(self):
         """
         Function to clear all the command instructions of the bot
         """
-        return self.session.get(f"{self.api_url}/deleteMyCommands").json()
+        return self.call("deleteMyCommands")
 
     def _emit_event(self, e_name, data=None):
         """
@@ -530,79 +809,155 @@ class TelegramBot:
         except Exception as E:
             return [False, E]
 
+    def process_update(self, update):
+        """
+        Handle a single update received from the Telegram API: call the command, text input, callback query or event functions
+        :param update: The update, an object of the Message or CallbackQuery class
+        """
+        if type(update) not in (
+            Message,
+            CallbackQuery,
+        ):  # Only two types of updates are checked here according to the use case but you may add more...
+            return
+        message = update
+        self._emit_event("new_message", message)
+        if (type(update) is Message) and (message.entities is not None):
+            entity_type = message.entities[0]["type"]
+            if (
+                entity_type == "bot_command"
+            ):  # Confirm if the update received is a bot command or not
+                text = str(message.text).strip()
+                command = text[1:]
+                if command in self.commands:
+                    self._emit_event("new_command", message)
+                    can_proceed = True
+                    if (
+                        "<any>" in self.commands
+                    ):  # A special feature to do a certain action before the main command action
+                        can_proceed = self.commands["<any>"](
+                            message
+                        )  # Remember: The function provided must return a boolean value
+                    if not can_proceed:
+                        return
+                    self.commands[command](message)  # Call the command function
+                    self.command_history[str(message.from_user.id)] = (
+                        command  # Save the command for the specific chat ID
+                    )
+                else:
+                    self._emit_event("incorrect_command", message)
+        elif type(update) is CallbackQuery:  # The callback query
+            callback_query = update
+            if self.inline_keyboard_inputs[callback_query.input_name].action_function:
+                self.inline_keyboard_inputs[callback_query.input_name].action_function(
+                    callback_query
+                )  # Call the function for that specific callback query
+            else:
+                self.answer_callback_query(
+                    callback_query.id
+                )  # Automatically answer the callback query as the function was empty
+        else:  # Normal messages other than bot commands and callback query
+            user_id = str(message.from_user.id)
+            if user_id in self.command_history:
+                command_used = self.command_history[user_id]
+                if (
+                    command_used in self.accept_text_input
+                ):  # Call the text input function if the text input is enabled for a specific command
+                    self.accept_text_input[command_used](message.text, message)
+                else:
+                    self._emit_event("new_text_message", message)
+            else:
+                self._emit_event("new_text_message", message)
+
+    def set_webhook(self, url: str, secret_token: str = None):
+        """
+        Ask Telegram to send the updates to a HTTPS URL instead of keeping them for "getUpdates"
+        :param url: The public URL of the webhook server
+        :param secret_token: The token Telegram sends in the "X-Telegram-Bot-Api-Secret-Token" header of every update
+        """
+        payload = {"url": url, "allowed_updates": ["message", "callback_query"]}
+        if secret_token:
+            payload["secret_token"] = secret_token
+        return self.call("setWebhook", payload)
+
+    def delete_webhook(self):
+        """
+        Stop sending the updates to the webhook, so "getUpdates" can be used again
+        """
+        return self.call("deleteWebhook")
+
+    def start_webhook(
+        self,
+        url: str = None,
+        host: str = "0.0.0.0",
+        port: int = 8443,
+        path: str = "/",
+        secret_token: str = None,
+    ):
+        """
+        Receive the updates with a webhook server instead of polling. Telegram sends every update to the server as
+        soon as it arrives, and the updates are handled by the same dispatcher as in start_polling. Blocks until
+        the server is stopped
+        :param url: The public HTTPS URL at which Telegram reaches the server (usually through a reverse proxy). Set it to None if the webhook is already set
+        :param host: The address on which the server listens
+        :param port: The port on which the server listens
+        :param path: The path of the URL to which the updates are sent
+        :param secret_token: The secret token checked in every request. A random one is made if the URL is given without it
+        """
+        if (url is not None) and (secret_token is None):
+            secret_token = token_urlsafe(32)
+        self.webhook_server = WebhookServer(
+            self.parse_update,
+            self.dispatcher.submit,
+            host=host,
+            port=port,
+            path=path,
+            secret_token=secret_token,
+        )
+        if url is not None:
+            response = self.set_webhook(url, secret_token)
+            if not response["ok"]:
+                self.webhook_server.server_close()
+                raise WebhookException(f"The webhook couldn't be set: {response}")
+        self._emit_event("start")  # Emit the start event as the bot is starting
+        try:
+            self.webhook_server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        self.webhook_server.server_close()
+        self.dispatcher.shutdown(wait=False)
+        self.send_queue.close()
+        self._emit_event("stop")
+
     def start_polling(self):
         """
-        Start the infinite polling wherein the bot/program will check for new updates and proceed accordingly
+        Start the infinite polling wherein the bot/program will check for new updates and proceed accordingly.
+        Every "getUpdates" request waits up to "polling_timeout" seconds for new updates. The updates are handled
+        by the dispatcher on its worker threads, so a slow handler doesn't delay the updates of the other chats.
+        A webhook set before (by start_webhook()) is deleted first, as "getUpdates" fails while it is set
         """
         self._emit_event("start")  # Emit the start event as the bot is starting
+        webhook_deleted = False
         while True:
             try:
-                update = self.get_updates()
-                if len(update) == 0:
-                    continue
-                latest_update = update[0]
-                if type(latest_update) not in (
-                    Message,
-                    CallbackQuery,
-                ):  # Only two types of updates are checked here according to the use case but you may add more...
-                    continue
-                message = latest_update
-                self._emit_event("new_message", message)
-                if (type(latest_update) is Message) and (message.entities is not None):
-                    entity_type = message.entities[0]["type"]
-                    if (
-                        entity_type == "bot_command"
-                    ):  # Confirm if the update received is a bot command or not
-                        text = str(message.text).strip()
-                        command = text[1:]
-                        if command in self.commands:
-                            self._emit_event("new_command", message)
-                            can_proceed = True
-                            if (
-                                "<any>" in self.commands
-                            ):  # A special feature to do a certain action before the main command action
-                                can_proceed = self.commands["<any>"](
-                                    message
-                                )  # Remember: The function provided must return a boolean value
-                            if not can_proceed:
-                                continue
-                            self.commands[command](message)  # Call the command function
-                            self.command_history[str(message.from_user.id)] = (
-                                command  # Save the command for the specific chat ID
-                            )
-                        else:
-                            self._emit_event("incorrect_command", message)
-                elif type(latest_update) is CallbackQuery:  # The callback query
-                    callback_query = latest_update
-                    if self.inline_keyboard_inputs[
-                        callback_query.input_name
-                    ].action_function:
-                        self.inline_keyboard_inputs[
-                            callback_query.input_name
-                        ].action_function(
-                            callback_query
-                        )  # Call the function for that specific callback query
-                    else:
-                        self.answer_callback_query(
-                            callback_query.id
-                        )  # Automatically answer the callback query as the function was empty
-                else:  # Normal messages other than bot commands and callback query
-                    user_id = str(message.from_user.id)
-                    if user_id in self.command_history:
-                        command_used = self.command_history[user_id]
-                        if (
-                            command_used in self.accept_text_input
-                        ):  # Call the text input function if the text input is enabled for a specific command
-                            self.accept_text_input[command_used](message.text, message)
-                        else:
-                            self._emit_event("new_text_message", message)
-                    else:
-                        self._emit_event("new_text_message", message)
+                if not webhook_deleted:
+                    response = self.delete_webhook()
+                    if not response.get("ok", False):
+                        print(
+                            f"pyTelegramBot > Couldn't delete the webhook: {response.get('description')}"
+                        )
+                    webhook_deleted = True
+                updates = self.get_updates()
+                for update in updates:
+                    self.dispatcher.submit(update)
             except ConnectionError as CE:
                 print(f"pyTelegramBot > Connection Error: {CE}")
+                sleep(1)
             except KeyboardInterrupt:
+                self.dispatcher.shutdown(wait=False)
+                self.send_queue.close()
                 self._emit_event("stop")
                 break
             except Exception as E:
                 print(f"pyTelegramBot > Polling Loop Exception: {E}")
                 print_exc()
+                sleep(1)
@@ -0,0 +1,143 @@
+"""
+Scheduler - Decides when a portal should be polled next
+====================================================================================================
+
+The interval between two polls of a portal changes with the situation:
+
+- After consecutive failures, the interval grows exponentially (with random jitter), so a portal which is down
+  isn't hammered
+- During the configured "hot" windows (like the hours in which a CAP round result is expected), the learned hot
+  hours (the hours of the day in which the portal changed the most) and for a while after a change (updates
+  usually come in bursts), the portal is polled faster
+- Otherwise, the normal interval is used
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+from collections import deque
+from datetime import datetime
+from random import uniform
+from time import time
+
+
+def parse_window(window: str):
+    """
+    Returns the start and end minute of the day of a window like "09:30-11:00"
+    :param window: The window
+    """
+    start, end = window.split("-")
+    start_hour, start_minute = (int(x) for x in start.strip().split(":"))
+    end_hour, end_minute = (int(x) for x in end.strip().split(":"))
+    return start_hour * 60 + start_minute, end_hour * 60 + end_minute
+
+
+class AdaptiveScheduler:
+    def __init__(
+        self,
+        interval: float = 180,
+        hot_interval: float = 45,
+        hot_windows: list = [],
+        burst_period: float = 1800,
+        max_backoff: float = 1800,
+        jitter: float = 0.1,
+        history_size: int = 200,
+    ):
+        """
+        Adaptive polling scheduler of a portal
+        :param interval: Normal number of seconds between two polls
+        :param hot_interval: Number of seconds between two polls in the hot windows and after a change
+        :param hot_windows: List of the daily hot windows, like ["09:30-11:00", "17:00-20:00"]
+        :param burst_period: Seconds after a change during which the hot interval is used
+        :param max_backoff: Maximum number of seconds between two polls after failures
+        :param jitter: Fraction of the interval added or removed randomly, so the polls don't happen in lockstep
+        :param history_size: Number of recent change times used to learn the hot hours
+        """
+        self.interval = interval
+        self.hot_interval = min(hot_interval, interval)
+        self.hot_windows = [(window, parse_window(window)) for window in hot_windows]
+        self.burst_period = burst_period
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+
+        self.change_times = deque(maxlen=history_size)
+        self.consecutive_failures = 0
+        self.next_poll = 0  # Time (from time.time()) of the next poll
+        self.reason = "first poll"
+
+    def learn(self, change_times: list):
+        """
+        Learn from the times at which the portal changed in the past (for example, from the history)
+        :param change_times: List of times (from time.time())
+        """
+        for change_time in sorted(change_times):
+            # Many updates seen together (or imported together) are a single change
+            if (not self.change_times) or (change_time - self.change_times[-1] > 60):
+                self.change_times.append(change_time)
+
+    def learned_hot_hours(self):
+        """
+        Returns the hours of the day in which the portal changed much more often than in the other hours
+        """
+        counts = [0] * 24
+        for change_time in self.change_times:
+            counts[datetime.fromtimestamp(change_time).hour] += 1
+        total = sum(counts)
+        if total == 0:
+            return set()
+        average = total / 24
+        return {
+            hour for hour, count in enumerate(counts) if count >= max(3, 2 * average)
+        }
+
+    def _current_hot_window(self, now):
+        minute_of_day = now.hour * 60 + now.minute
+        for window, (start, end) in self.hot_windows:
+            if start <= end:
+                if start <= minute_of_day < end:
+                    return window
+            elif (minute_of_day >= start) or (
+                minute_of_day < end
+            ):  # Windows going over midnight
+                return window
+        return None
+
+    def _schedule(self, delay, reason, now):
+        delay = max(1, delay * uniform(1 - self.jitter, 1 + self.jitter))
+        self.next_poll = now + delay
+        self.reason = reason
+        return self.next_poll
+
+    def record_poll(self, success: bool, changed: bool = False, now: float = None):
+        """
+        Record the result of a poll and schedule the next one. Returns the time of the next poll
+        :param success: Set it to False if the poll failed
+        :param changed: Set it to True if new updates were found
+        :param now: The current time (from time.time())
+        """
+        now = time() if now is None else now
+        if not success:
+            self.consecutive_failures += 1
+            # Exponential backoff with random jitter, never shorter than the normal interval
+            delay = min(
+                self.max_backoff, self.interval * (2 ** (self.consecutive_failures - 1))
+            )
+            self.next_poll = now + uniform(self.interval, max(self.interval, delay))
+            self.reason = f"backoff after {self.consecutive_failures} failure(s)"
+            return self.next_poll
+
+        self.consecutive_failures = 0
+        if changed:
+            self.change_times.append(now)
+
+        current = datetime.fromtimestamp(now)
+        hot_window = self._current_hot_window(current)
+        if hot_window:
+            return self._schedule(self.hot_interval, f"hot window {hot_window}", now)
+        if current.hour in self.learned_hot_hours():
+            return self._schedule(
+                self.hot_interval, f"learned hot hour {current.hour:02d}:00", now
+            )
+        if self.change_times and (now - self.change_times[-1] < self.burst_period):
+            return self._schedule(self.hot_interval, "recent change", now)
+        return self._schedule(self.interval, "normal interval", now)
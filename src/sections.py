@@ -0,0 +1,245 @@
+"""
+Sections - Extracts the update sections from the page of a portal
+====================================================================================================
+
+Only three regions of the page contain updates: the "card-body" boxes (News, Notifications and Downloads),
+the "important-text" marquee and the links of the "LeftMenu". The parser backend can be chosen:
+
+- "lxml": Parses the page with lxml and reads the three regions using XPath (fastest)
+- "lxml-stream": Feeds the page to an incremental lxml parser and throws away everything outside the
+  three regions as soon as it is parsed (lowest peak memory)
+- "html.parser": The original BeautifulSoup path which builds the whole tree with Python's parser
+
+All the backends return the same result. Use "benchmarks/bench_parser.py" to compare them.
+
+Every update is read as an item: its text and the targets ("href") of its links, so an update whose PDF
+is replaced without changing its text can be detected (see snapshot.py).
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+from bs4 import BeautifulSoup
+from lxml import html as lxml_html
+from lxml.etree import HTMLPullParser
+
+PARSER_BACKENDS = ("lxml", "lxml-stream", "html.parser")
+
+
+def _has_class(class_name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+CARDS_XPATH = f"//div[{_has_class('card-body')}]"
+IMPORTANT_XPATH = f"(//div[{_has_class('important-text')}])[1]"
+LEFT_MENU_XPATH = "(//div[@id='LeftMenu'])[1]"
+LINK_BOXES_XPATH = f".//div[{_has_class('LinkBox')}]"
+
+
+def _clean_text(text):
+    return str(text).replace("\xa0", " ").strip()
+
+
+def _text_of(element):
+    return "".join(element.itertext())
+
+
+def _links_of(element):
+    """
+    Internal function which returns the targets of the links inside an element (or of the element itself). Don't use.
+    """
+    return tuple(a.get("href").strip() for a in element.iter("a") if a.get("href"))
+
+
+def _build_result(profile, cards, important_messages, raw_button_names):
+    """
+    Internal function to name the sections according to the parsing profile. Don't use.
+    """
+    if len(cards) != len(profile["cards"]):
+        raise ValueError(
+            f"Expected {len(profile['cards'])} card sections but found {len(cards)}"
+        )
+    replace_terms = profile["replace_terms"]
+    button_names = []
+    for button_text, links in raw_button_names:
+        for term in replace_terms:
+            button_text = button_text.replace(term, replace_terms[term])
+        button_names.append((button_text, links))
+
+    result = dict(zip(profile["cards"], cards))
+    result[profile["important"]] = important_messages
+    result[profile["buttons"]] = button_names
+    return result
+
+
+def _read_card(card):
+    return [(_clean_text(_text_of(p)), _links_of(p)) for p in card.iter("p")]
+
+
+def _read_important(container):
+    return [
+        (
+            _clean_text(_text_of(lang)),
+            tuple(
+                a.get("href").strip() for a in lang.iterancestors("a") if a.get("href")
+            )
+            + _links_of(lang),
+        )
+        for lang in container.iter("lang")
+    ]
+
+
+def _read_buttons(left_menu):
+    names = []
+    for link_box in left_menu.xpath(LINK_BOXES_XPATH):
+        for contents in link_box:
+            names.extend(
+                (_text_of(a).strip(), _links_of(a))
+                for a in contents.iterdescendants("a")
+            )
+    return names
+
+
+def _extract_lxml(content):
+    tree = lxml_html.fromstring(content)
+    cards = [_read_card(card) for card in tree.xpath(CARDS_XPATH)]
+
+    important_container = tree.xpath(IMPORTANT_XPATH)
+    if not important_container:
+        raise ValueError("The 'important-text' section was not found")
+    left_menu = tree.xpath(LEFT_MENU_XPATH)
+    if not left_menu:
+        raise ValueError("The 'LeftMenu' section was not found")
+    return cards, _read_important(important_container[0]), _read_buttons(left_menu[0])
+
+
+def _region_of(element):
+    """
+    Internal function which returns the name of the region an element starts, if any. Don't use.
+    """
+    if element.tag != "div":
+        return None
+    if element.get("id") == "LeftMenu":
+        return "buttons"
+    classes = (element.get("class") or "").split()
+    if "card-body" in classes:
+        return "card"
+    if "important-text" in classes:
+        return "important"
+    return None
+
+
+def _extract_lxml_stream(content, chunk_size=16384):
+    parser = HTMLPullParser(events=("start", "end"))
+    cards = []
+    important_messages = None
+    button_names = None
+    open_regions = 0  # Number of regions the parser is inside right now
+
+    for start in range(0, len(content), chunk_size):
+        parser.feed(content[start : start + chunk_size])
+        for event, element in parser.read_events():
+            region = _region_of(element)
+            if event == "start":
+                if region:
+                    open_regions += 1
+                continue
+
+            if region == "card":
+                cards.append(_read_card(element))
+            elif region == "important" and important_messages is None:
+                important_messages = _read_important(element)
+            elif region == "buttons" and button_names is None:
+                button_names = _read_buttons(element)
+            if region:
+                open_regions -= 1
+            if open_regions == 0:
+                # Nothing outside the regions is needed, so free it as soon as it is parsed
+                element.clear(keep_tail=False)
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+    parser.close()
+
+    if important_messages is None:
+        raise ValueError("The 'important-text' section was not found")
+    if button_names is None:
+        raise ValueError("The 'LeftMenu' section was not found")
+    return cards, important_messages, button_names
+
+
+def _soup_links_of(tag):
+    """
+    Internal function which returns the targets of the links inside a BeautifulSoup tag. Don't use.
+    """
+    links = [tag] if (tag.name == "a") and tag.get("href") else []
+    links.extend(tag.find_all("a", href=True))
+    return tuple(a["href"].strip() for a in links if a["href"])
+
+
+def _extract_html_parser(content):
+    soup = BeautifulSoup(content, "html.parser")
+
+    cards = []
+    for card in soup.find_all("div", class_="card-body"):
+        cards.append(
+            [(_clean_text(p.get_text()), _soup_links_of(p)) for p in card.find_all("p")]
+        )
+
+    important_container = soup.find("div", class_="important-text")
+    important_messages = [
+        (
+            _clean_text(m.get_text()),
+            tuple(
+                a["href"].strip()
+                for a in m.find_parents("a")
+                if a.get("href") and a["href"].strip()
+            )
+            + _soup_links_of(m),
+        )
+        for m in important_container.find_all("lang")
+    ]
+
+    left_menu = soup.find("div", id="LeftMenu")
+    raw_button_names = []
+    for container in left_menu.find_all("div", class_="LinkBox"):
+        for contents in container:
+            if hasattr(contents, "find_all"):  # Skip the text between the tags
+                raw_button_names.extend(contents.find_all("a"))
+    button_names = [
+        (str(b.get_text()).strip(), _soup_links_of(b)) for b in raw_button_names
+    ]
+    return cards, important_messages, button_names
+
+
+EXTRACTORS = {
+    "lxml": _extract_lxml,
+    "lxml-stream": _extract_lxml_stream,
+    "html.parser": _extract_html_parser,
+}
+
+
+def extract_items(content: bytes, profile: dict, backend: str = "lxml"):
+    """
+    Returns the updates found on the page as (text, link targets) items, named according to the parsing profile
+    :param content: The HTML content of the page
+    :param profile: The parsing profile of the portal (see portals.PROFILES)
+    :param backend: The parser backend (see PARSER_BACKENDS)
+    """
+    if backend not in EXTRACTORS:
+        raise ValueError(
+            f"Invalid parser backend, please choose one from the list: {list(PARSER_BACKENDS)}"
+        )
+    return _build_result(profile, *EXTRACTORS[backend](content))
+
+
+def extract_sections(content: bytes, profile: dict, backend: str = "lxml"):
+    """
+    Returns the texts of the updates found on the page, named according to the parsing profile
+    :param content: The HTML content of the page
+    :param profile: The parsing profile of the portal (see portals.PROFILES)
+    :param backend: The parser backend (see PARSER_BACKENDS)
+    """
+    return {
+        name: [text for text, _ in items]
+        for name, items in extract_items(content, profile, backend).items()
+    }
@@ -0,0 +1,193 @@
+"""
+Snapshot - The last seen state of the page of a portal and the structural diff between two polls
+====================================================================================================
+
+A snapshot keeps every section (category) of the page as a list of items, each item being the text of an
+update and the targets of its links. Every item and every section has a hash, so comparing a new poll with
+the previous snapshot skips the unchanged sections without looking at their items.
+
+In a changed section, the items are matched in this order:
+
+- The same text and links: unchanged
+- The same text with other links (like a replaced PDF): edited
+- The same links with another text (like a corrected title): edited
+- The rest: added (new on the page) or removed
+
+The snapshot of every portal is saved in "snapshot_<portal name>.json", so the edits are also found after
+the program is restarted.
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+from collections import Counter
+from hashlib import sha256
+from json import dumps
+
+from history import read_history_file, write_file_atomically
+
+
+def item_hash(text: str, links: tuple):
+    """
+    Returns the hash of an item, which changes if its text or any of its link targets change
+    :param text: The text of the item
+    :param links: The targets of the links of the item
+    """
+    return sha256("\x00".join((text,) + tuple(links)).encode("utf-8")).hexdigest()
+
+
+class SectionDiff:
+    def __init__(self, added: list, removed: list, edited: list):
+        """
+        The changes of a section between two snapshots
+        :param added: The new items, as (text, links)
+        :param removed: The items which aren't on the page anymore
+        :param edited: The changed items, as ((old text, old links), (new text, new links))
+        """
+        self.added = added
+        self.removed = removed
+        self.edited = edited
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.edited)
+
+    def __repr__(self):
+        return f"SectionDiff({len(self.added)} added, {len(self.removed)} removed, {len(self.edited)} edited)"
+
+
+def _match(old_items, new_items, key):
+    """
+    Internal function which pairs the old and new items with the same key (items with the key None are never
+    paired), in order. Returns the pairs, the unpaired old items and the unpaired new items. Don't use.
+    """
+    waiting = {}
+    for index, item in enumerate(old_items):
+        item_key = key(item)
+        if item_key is not None:
+            waiting.setdefault(item_key, []).append(index)
+    pairs, paired, unpaired_new = [], set(), []
+    for item in new_items:
+        indexes = waiting.get(key(item))
+        if indexes:
+            index = indexes.pop(0)
+            paired.add(index)
+            pairs.append((old_items[index], item))
+        else:
+            unpaired_new.append(item)
+    unpaired_old = [item for index, item in enumerate(old_items) if index not in paired]
+    return pairs, unpaired_old, unpaired_new
+
+
+def _without(items, counts):
+    """
+    Internal function which returns the items except the first "counts[item]" copies of each. Don't use.
+    """
+    counts = Counter(counts)
+    result = []
+    for item in items:
+        if counts[item] > 0:
+            counts[item] -= 1
+        else:
+            result.append(item)
+    return result
+
+
+def diff_items(old_items: list, new_items: list):
+    """
+    Returns the SectionDiff between the items of a section in two snapshots
+    :param old_items: The items of the previous snapshot, as (text, links)
+    :param new_items: The items of the new snapshot
+    """
+    # The unchanged items, counted so that every copy of a repeated item is matched once
+    unchanged = Counter(old_items) & Counter(new_items)
+    removed = _without(old_items, unchanged)
+    added = _without(new_items, unchanged)
+
+    # The same text with other links, then the same links with another text
+    edited, removed, added = _match(removed, added, key=lambda item: item[0])
+    link_edits, removed, added = _match(
+        removed, added, key=lambda item: item[1] or None
+    )
+    return SectionDiff(added, removed, edited + link_edits)
+
+
+class Snapshot:
+    def __init__(self, sections: dict):
+        """
+        The items of every section of the page of a portal
+        :param sections: Dictionary of the name of the section -> list of (text, links) items
+        """
+        self.sections = {
+            name: [(text, tuple(links)) for text, links in items]
+            for name, items in sections.items()
+        }
+        self.hashes = {
+            name: sha256(
+                "".join(item_hash(text, links) for text, links in items).encode()
+            ).hexdigest()
+            for name, items in self.sections.items()
+        }
+
+    def texts(self):
+        """
+        Returns the texts of the items of every section
+        """
+        return {
+            name: [text for text, _ in items] for name, items in self.sections.items()
+        }
+
+    def diff(self, previous):
+        """
+        Returns the SectionDiff of every section which changed since the previous snapshot. The sections with
+        the same hash are skipped. Every item is added if there is no previous snapshot
+        :param previous: The previous Snapshot or None
+        """
+        changes = {}
+        for name, items in self.sections.items():
+            if previous is None or name not in previous.sections:
+                changes[name] = SectionDiff(list(items), [], [])
+            elif self.hashes[name] != previous.hashes[name]:
+                changes[name] = diff_items(previous.sections[name], items)
+        return changes
+
+    def to_dict(self):
+        """
+        Returns the snapshot as a dictionary which can be saved as JSON
+        """
+        return {
+            name: {
+                "hash": self.hashes[name],
+                "items": [[text, list(links)] for text, links in items],
+            }
+            for name, items in self.sections.items()
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """
+        Returns the snapshot saved with to_dict()
+        :param data: The dictionary
+        """
+        return cls({name: section["items"] for name, section in data.items()})
+
+    def save(self, path: str):
+        """
+        Write the snapshot to a JSON file
+        :param path: The path of the file
+        """
+        write_file_atomically(path, dumps(self.to_dict(), indent=4))
+
+
+def load_snapshot(path: str):
+    """
+    Returns the snapshot saved in a file, or None if there is none
+    :param path: The path of the file
+    """
+    data = read_history_file(path)
+    if not data:
+        return None
+    try:
+        return Snapshot.from_dict(data)
+    except (KeyError, TypeError, ValueError) as E:
+        print(f"[*] Snapshot: Ignoring the invalid snapshot '{path}': {E}")
+        return None
@@ -0,0 +1,171 @@
+"""
+Status - The status message of the program on Telegram
+====================================================================================================
+
+The program keeps a single Telegram message with a snapshot of its metrics (like the fetch latency of the
+portals and the number of queued alerts) up to date. The message is edited only when the snapshot changes or
+when it wasn't edited for a long time, never more often than the minimum interval (Telegram limits the edits
+of a chat). The edits have the lowest priority in the send queue of the bot, so they never delay an alert.
+When an edit fails, the next one is delayed exponentially, or by the time asked by Telegram with
+a "429 Too Many Requests" error.
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+from html import escape
+from threading import Event
+from time import strftime, time
+
+from pyTelegramBot import PRIORITY_LOW
+from pyTelegramBot.Exceptions import TelegramAPIError
+
+
+class StatusReporter:
+    def __init__(
+        self,
+        bot,
+        chat_id,
+        snapshot,
+        title: str = "Program Status",
+        min_interval: float = 30,
+        max_interval: float = 900,
+        check_interval: float = 5,
+        max_backoff: float = 900,
+    ):
+        """
+        Keeps a Telegram message with the status of the program up to date
+        :param bot: Object of the TelegramBot class
+        :param chat_id: The ID of the chat in which the status message is sent
+        :param snapshot: Function which returns the current metrics as a dictionary of {name: value}
+        :param title: The title of the status message
+        :param min_interval: Minimum number of seconds between two edits
+        :param max_interval: The message is edited after this many seconds even if the snapshot didn't change
+        :param check_interval: Number of seconds between two checks of the snapshot
+        :param max_backoff: Maximum number of seconds to wait after failures
+        """
+        self.bot = bot
+        self.chat_id = chat_id
+        self.snapshot = snapshot
+        self.title = title
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.check_interval = check_interval
+        self.max_backoff = max_backoff
+
+        self.message_id = None
+        self._last_snapshot = None
+        self._last_edit = 0
+        # Time before which nothing is sent, after a failure or a rate limit
+        self._not_before = 0
+        self._failures = 0
+        self._stop = Event()
+        self.stats = {"edits": 0, "skipped": 0, "failures": 0, "rate_limited": 0}
+
+    def render(self, snapshot: dict):
+        """
+        Returns the HTML text of the status message
+        :param snapshot: The metrics
+        """
+        lines = [f"<b>{escape(self.title)}:</b> <i>Running!</i>", ""]
+        for name, value in snapshot.items():
+            lines.append(f"<b>{escape(str(name))}:</b> <i>{escape(str(value))}</i>")
+        lines.append("")
+        lines.append(f"<b>Updated:</b> <i>{strftime('%d/%m/%Y %H:%M:%S')}</i>")
+        return "\n".join(lines)
+
+    def _failed(self, now, reason, retry_after=None):
+        """
+        Internal function to delay the next attempt after a failure. Don't use.
+        """
+        self._failures += 1
+        self.stats["failures"] += 1
+        if retry_after is not None:
+            self.stats["rate_limited"] += 1
+            delay = retry_after
+        else:
+            delay = min(
+                self.max_backoff, self.min_interval * (2 ** (self._failures - 1))
+            )
+        self._not_before = now + delay
+        print(
+            f"[*] Telegram Updates: Couldn't update the status message ({reason}), retrying in {delay:.0f}s"
+        )
+
+    def _publish(self, text, now):
+        """
+        Internal function to send or edit the status message. Returns True if it was successful. Don't use.
+        """
+        try:
+            if self.message_id is None:
+                message = self.bot.send_message(
+                    self.chat_id, text, priority=PRIORITY_LOW, raise_on_error=True
+                )
+                self.message_id = message.id
+                print(
+                    f"[*] Telegram Updates: Sent the status message with the ID: {self.message_id}"
+                )
+            else:
+                try:
+                    self.bot.edit_message(
+                        self.chat_id,
+                        self.message_id,
+                        text,
+                        priority=PRIORITY_LOW,
+                        raise_on_error=True,
+                    )
+                except TelegramAPIError as E:
+                    if "message is not modified" in E.description:
+                        pass
+                    elif "message to edit not found" in E.description:
+                        self.message_id = None  # It was deleted, so send a new one
+                        return self._publish(text, now)
+                    else:
+                        raise
+        except TelegramAPIError as E:
+            self._failed(now, E, E.retry_after)
+            return False
+        except Exception as E:
+            self._failed(now, E)
+            return False
+        self._failures = 0
+        self._last_edit = now
+        self.stats["edits"] += 1
+        return True
+
+    def update(self, now: float = None):
+        """
+        Edit the status message if the snapshot changed (or if it wasn't edited for a long time) and the rate limits allow it.
+        Returns True if the message was edited
+        :param now: The current time (from time.time())
+        """
+        now = time() if now is None else now
+        if now < max(self._not_before, self._last_edit + self.min_interval):
+            return False
+        snapshot = self.snapshot()
+        if (snapshot == self._last_snapshot) and (
+            now - self._last_edit < self.max_interval
+        ):
+            self.stats["skipped"] += 1
+            return False
+        if self._publish(self.render(snapshot), now):
+            self._last_snapshot = snapshot
+            return True
+        return False
+
+    def run(self):
+        """
+        Keep the status message up to date until stop() is called
+        """
+        while not self._stop.is_set():
+            try:
+                self.update()
+            except Exception as E:
+                print(f"[*] Telegram Updates: An unknown error occurred: {E}")
+            self._stop.wait(self.check_interval)
+
+    def stop(self):
+        """
+        Stop updating the status message
+        """
+        self._stop.set()
@@ -0,0 +1,177 @@
+"""
+Subscribers - The Telegram chats which receive the alerts
+====================================================================================================
+
+Anyone can subscribe to the alerts with the /subscribe command of the bot, optionally only to some
+categories (like "News") or portals (like "fe2025"). The subscribers are saved in the "subscribers.json"
+file, along with the number of alerts delivered to them.
+
+An alert is broadcast to all the matching subscribers at once: the messages are handed to the send queue
+of the bot by a bounded pool of threads, so the broadcast takes as long as the rate limits of Telegram
+require instead of one round trip per subscriber.
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from json import dumps
+from threading import RLock
+from time import perf_counter, time
+
+from history import read_history_file, write_file_atomically
+
+
+def parse_filters(text: str):
+    """
+    Returns the list of filters from a text like "News, fe2025/Downloads". An empty list means everything
+    :param text: The text sent by the user
+    """
+    filters = [part.strip() for part in text.replace("\n", ",").split(",")]
+    filters = [part for part in filters if part]
+    if any(part.lower() in ("all", "everything") for part in filters):
+        return []
+    return filters
+
+
+class SubscriberStore:
+    def __init__(self, path: str = "subscribers.json"):
+        """
+        Persistent store of the subscribed chats
+        :param path: Path of the JSON file in which the subscribers are saved
+        """
+        self.path = path
+        self._lock = RLock()
+        # Chat ID (as a string) -> {"name", "filters", "since", "delivered", "failed"}
+        self._subscribers = read_history_file(path)
+
+    def save(self):
+        """
+        Write the subscribers to the file
+        """
+        with self._lock:
+            data = dumps(self._subscribers, indent=4)
+        write_file_atomically(self.path, data)
+
+    def subscribe(self, chat_id, filters: list = [], name: str = ""):
+        """
+        Add a subscriber or change its filters
+        :param chat_id: The ID of the chat
+        :param filters: Names of the categories ("News"), portals ("fe2025") or both ("fe2025/News") to receive. An empty list means everything
+        :param name: The name of the chat, only used to recognize it in the file
+        """
+        with self._lock:
+            subscriber = self._subscribers.setdefault(
+                str(chat_id), {"since": time(), "delivered": 0, "failed": 0}
+            )
+            subscriber["name"] = name
+            subscriber["filters"] = list(filters)
+        self.save()
+
+    def unsubscribe(self, chat_id):
+        """
+        Remove a subscriber. Returns False if the chat wasn't subscribed
+        :param chat_id: The ID of the chat
+        """
+        with self._lock:
+            removed = self._subscribers.pop(str(chat_id), None) is not None
+        if removed:
+            self.save()
+        return removed
+
+    def get(self, chat_id):
+        """
+        Returns a copy of the data of a subscriber, or None if the chat isn't subscribed
+        :param chat_id: The ID of the chat
+        """
+        with self._lock:
+            subscriber = self._subscribers.get(str(chat_id))
+            return dict(subscriber) if subscriber is not None else None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    @staticmethod
+    def matches(filters: list, portal_name: str, category: str):
+        """
+        Returns True if an update of a category of a portal passes the filters of a subscriber
+        :param filters: The filters of the subscriber
+        :param portal_name: The name of the portal
+        :param category: The name of the category
+        """
+        if not filters:
+            return True
+        names = {
+            portal_name.lower(),
+            category.lower(),
+            f"{portal_name}/{category}".lower(),
+        }
+        return any(f.lower() in names for f in filters)
+
+    def recipients(self, portal_name: str, category: str):
+        """
+        Returns the IDs of the chats which should receive an update of a category of a portal
+        :param portal_name: The name of the portal
+        :param category: The name of the category
+        """
+        with self._lock:
+            return [
+                int(chat_id)
+                for chat_id, subscriber in self._subscribers.items()
+                if self.matches(subscriber.get("filters", []), portal_name, category)
+            ]
+
+    def record_deliveries(self, delivered: list, failed: list):
+        """
+        Count the delivered and failed messages of the subscribers and save them
+        :param delivered: IDs of the chats to which the message was delivered
+        :param failed: IDs of the chats to which the message couldn't be delivered
+        """
+        with self._lock:
+            for chat_ids, key in ((delivered, "delivered"), (failed, "failed")):
+                for chat_id in chat_ids:
+                    subscriber = self._subscribers.get(str(chat_id))
+                    if subscriber is not None:
+                        subscriber[key] = subscriber.get(key, 0) + 1
+        self.save()
+
+
+def broadcast(
+    bot, chat_ids: list, message: str, priority: int, max_in_flight: int = 32
+):
+    """
+    Send a message to many chats at once and return the delivery report
+    :param bot: Object of the TelegramBot class
+    :param chat_ids: The IDs of the chats
+    :param message: The message (HTML)
+    :param priority: The priority of the messages in the send queue of the bot
+    :param max_in_flight: Maximum number of messages waiting in the send queue at the same time
+    """
+
+    def send(chat_id):
+        try:
+            response = bot.send_message(chat_id, message, priority=priority)
+        except Exception as E:
+            return chat_id, str(E)
+        # The send_message function returns the response (instead of a Message) if it failed
+        if isinstance(response, dict):
+            return chat_id, response.get("description", "Unknown error")
+        return chat_id, None
+
+    report = {"delivered": [], "failed": {}, "blocked": []}
+    start = perf_counter()
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(max_in_flight, len(chat_ids))),
+        thread_name_prefix="broadcast",
+    ) as pool:
+        for chat_id, error in pool.map(send, chat_ids):
+            if error is None:
+                report["delivered"].append(chat_id)
+            else:
+                report["failed"][chat_id] = error
+                # The user blocked the bot or the chat doesn't exist anymore
+                if ("blocked" in error) or ("chat not found" in error):
+                    report["blocked"].append(chat_id)
+    report["duration"] = perf_counter() - start
+    return report
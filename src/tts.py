@@ -0,0 +1,414 @@
+"""
+TTS - Text to speech with a disk cache of the synthesized clips
+====================================================================================================
+
+Every clip is saved in the cache directory under the hash of (text, language, engine), so a text which was
+already spoken once is never synthesized again. The least recently used clips are deleted when the cache
+grows over its size limit.
+
+The voice messages are made of fixed template parts (like "Hello ..., there is a new ... message") and a
+variable part (the update itself). Each part is a separate clip and the clips are joined into one file.
+
+The clips are made by synthesis engines: Google Text-to-Speech ("gtts", needs the internet) and eSpeak NG
+("espeak", offline, "pkg install espeak" on Termux). The SpeechSynthesizer tries the engines in order and
+falls back to the next one when an engine fails. An engine which failed is skipped for a while, so the alerts
+don't wait for the network timeout again and again.
+
+--------------------
+Author: @Sid72020123 on Github
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+from hashlib import sha256
+from io import BytesIO
+from threading import Lock
+from time import perf_counter, time
+
+from gtts import gTTS
+
+
+class SynthesisEngine:
+    name = "base"
+    extension = "mp3"  # The clips can be joined only if they are MP3
+
+    def is_available(self):
+        """
+        Returns True if the engine can be used on this device
+        """
+        return True
+
+    def synthesize(self, text: str, lang: str):
+        """
+        Returns the audio data of a text
+        :param text: The text
+        :param lang: The language of the text
+        """
+        raise NotImplementedError
+
+
+class GTTSEngine(SynthesisEngine):
+    name = "gtts"
+
+    def __init__(self, timeout: float = 10):
+        """
+        Google Text-to-Speech engine (needs the internet)
+        :param timeout: Seconds to wait for the response of Google
+        """
+        self.timeout = timeout
+
+    def synthesize(self, text: str, lang: str):
+        buffer = BytesIO()
+        gTTS(text=text, lang=lang, timeout=self.timeout).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class EspeakEngine(SynthesisEngine):
+    name = "espeak"
+
+    def __init__(self, voice: str = None, speed: int = 150):
+        """
+        Offline eSpeak NG engine. Makes MP3 clips if "lame" is installed and WAV clips otherwise
+        :param voice: The eSpeak voice (the language is used by default)
+        :param speed: Words per minute
+        """
+        self.voice = voice
+        self.speed = speed
+        self.command = shutil.which("espeak-ng") or shutil.which("espeak")
+        self.lame = shutil.which("lame")
+        self.extension = "mp3" if self.lame else "wav"
+
+    def is_available(self):
+        return self.command is not None
+
+    def synthesize(self, text: str, lang: str):
+        wav = subprocess.run(
+            [
+                self.command,
+                "-v",
+                self.voice or lang,
+                "-s",
+                str(self.speed),
+                "--stdout",
+                text,
+            ],
+            capture_output=True,
+            check=True,
+        ).stdout
+        if not self.lame:
+            return wav
+        return subprocess.run(
+            [self.lame, "--quiet", "-", "-"], input=wav, capture_output=True, check=True
+        ).stdout
+
+
+ENGINES = {engine.name: engine for engine in (GTTSEngine, EspeakEngine)}
+
+
+def _last_use(path):
+    """
+    Internal function which returns the time a clip was last used, or 0 if its file was deleted. Don't use.
+    """
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0
+
+
+class ClipCache:
+    def __init__(self, directory: str = "tts_cache", max_bytes: int = 50 * 1024 * 1024):
+        """
+        Disk cache of the synthesized clips with LRU eviction
+        :param directory: The directory in which the clips are saved
+        :param max_bytes: Maximum total size of the clips
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = Lock()
+        self._creating = {}  # Clip path -> lock held by the thread which synthesizes it
+        self._in_use = {}  # Clip path -> number of users which didn't release it yet
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+        os.makedirs(directory, exist_ok=True)
+        # Clip path -> size. The last use of a clip (for LRU) is the modification time of its file
+        self._sizes = {}
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(".tmp"):
+                os.remove(path)  # Left over by a crash while saving a clip
+            elif os.path.isfile(path):
+                self._sizes[path] = os.path.getsize(path)
+        self._total_bytes = sum(self._sizes.values())
+
+    def path_for(self, text: str, lang: str, engine: str, extension: str = "mp3"):
+        """
+        Returns the path of the clip of a text
+        :param text: The text
+        :param lang: The language of the text
+        :param engine: The name of the engine which synthesizes the clip
+        :param extension: The file extension of the clip
+        """
+        key = sha256(f"{engine}\0{lang}\0{text}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    def get_or_create(
+        self, text: str, lang: str, engine: str, synthesize, extension: str = "mp3"
+    ):
+        """
+        Returns the path of the clip of a text, synthesizing it only if it isn't in the cache. The clip isn't
+        evicted until it is released with release()
+        :param text: The text
+        :param lang: The language of the text
+        :param engine: The name of the engine which synthesizes the clip
+        :param synthesize: Function which accepts the text and the language and returns the clip data
+        :param extension: The file extension of the clip
+        """
+        path = self.path_for(text, lang, engine, extension)
+        with self._lock:
+            creating = self._creating.setdefault(path, Lock())
+        # Only one thread synthesizes a clip, the others wait for it and then find it in the cache
+        with creating:
+            try:
+                with self._lock:
+                    if self._use_cached(path):
+                        self.stats["hits"] += 1
+                        return path
+                    self.stats["misses"] += 1
+
+                data = synthesize(text, lang)
+                os.makedirs(self.directory, exist_ok=True)  # In case it was deleted
+                file_descriptor, temp_path = tempfile.mkstemp(
+                    suffix=".tmp", dir=self.directory
+                )
+                try:
+                    with os.fdopen(file_descriptor, "wb") as file:
+                        file.write(data)
+                    os.replace(temp_path, path)
+                except BaseException:
+                    os.remove(temp_path)
+                    raise
+                with self._lock:
+                    if path not in self._sizes:
+                        self._sizes[path] = len(data)
+                        self._total_bytes += len(data)
+                    self._in_use[path] = self._in_use.get(path, 0) + 1
+                    self._evict()
+            finally:
+                with self._lock:
+                    self._creating.pop(path, None)
+        return path
+
+    def _use_cached(self, path):
+        """
+        Internal function which marks a cached clip as used. Returns False if it isn't cached or its file was
+        deleted (like when the cache directory is cleared). Don't use.
+        """
+        if path not in self._sizes:
+            return False
+        try:
+            os.utime(path)  # Mark the clip as recently used
+        except FileNotFoundError:
+            self._total_bytes -= self._sizes.pop(path)
+            return False
+        self._in_use[path] = self._in_use.get(path, 0) + 1
+        return True
+
+    def release(self, paths: list):
+        """
+        Allow the clips returned by get_or_create() to be evicted again
+        :param paths: The paths of the clips
+        """
+        with self._lock:
+            for path in paths:
+                count = self._in_use.get(path, 0) - 1
+                if count > 0:
+                    self._in_use[path] = count
+                else:
+                    self._in_use.pop(path, None)
+            self._evict()
+
+    def _evict(self):
+        """
+        Internal function to delete the least recently used clips while the cache is too big. The clips in use
+        are kept. Don't use.
+        """
+        if self._total_bytes <= self.max_bytes:
+            return
+        by_last_use = sorted(self._sizes, key=_last_use)
+        for path in by_last_use:
+            if self._total_bytes <= self.max_bytes:
+                break
+            if path in self._in_use:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._total_bytes -= self._sizes.pop(path)
+            self.stats["evictions"] += 1
+
+
+def join_clips(clip_paths: list, output_path: str):
+    """
+    Join MP3 clips into a single file. MP3 frames are independent, so the files can simply be put one after another
+    :param clip_paths: The paths of the clips, in the order they are spoken
+    :param output_path: The path of the joined file
+    """
+    temp_path = f"{output_path}.tmp"
+    with open(temp_path, "wb") as output:
+        for path in clip_paths:
+            with open(path, "rb") as clip:
+                output.write(clip.read())
+    os.replace(temp_path, output_path)
+    return output_path
+
+
+class SpeechSynthesizer:
+    def __init__(self, engines: list, cache: ClipCache, cooldown: float = 300):
+        """
+        Makes the voice messages using the first engine which works
+        :param engines: List of SynthesisEngine objects, in the order they should be tried
+        :param cache: The cache of the clips
+        :param cooldown: Seconds during which an engine which failed is skipped
+        """
+        self.engines = engines
+        self.cache = cache
+        self.cooldown = cooldown
+        self._lock = Lock()
+        self._failed_at = {}  # Engine name -> time of its last failure
+        self.stats = {
+            engine.name: {
+                "clips": 0,
+                "failures": 0,
+                "total_latency": 0.0,
+                "last_latency": None,
+            }
+            for engine in engines
+        }
+
+    def _timed(self, engine):
+        """
+        Internal function which wraps the synthesize function of an engine to record its latency. Don't use.
+        """
+
+        def synthesize(text, lang):
+            start = perf_counter()
+            data = engine.synthesize(text, lang)
+            latency = perf_counter() - start
+            with self._lock:
+                stats = self.stats[engine.name]
+                stats["clips"] += 1
+                stats["total_latency"] += latency
+                stats["last_latency"] = latency
+            return data
+
+        return synthesize
+
+    def _engines_to_try(self):
+        """
+        Internal function which returns the available engines. The engines which failed recently are tried last. Don't use.
+        """
+        now = time()
+        with self._lock:
+            return sorted(
+                (engine for engine in self.engines if engine.is_available()),
+                key=lambda e: now - self._failed_at.get(e.name, 0) < self.cooldown,
+            )
+
+    def prepare_clips(self, segments: list, lang: str = "en"):
+        """
+        Synthesize and cache clips in advance using the first engine which makes MP3 clips
+        :param segments: The texts of the clips
+        :param lang: The language of the texts
+        """
+        for engine in self._engines_to_try():
+            if engine.extension == "mp3":
+                synthesize = self._timed(engine)
+                for segment in segments:
+                    clip = self.cache.get_or_create(
+                        segment, lang, engine.name, synthesize
+                    )
+                    self.cache.release([clip])
+                return
+
+    def create_voice_message(self, segments: list, output_path: str, lang: str = "en"):
+        """
+        Make a voice message from its parts and return the path of the file (its extension depends on the engine used)
+        :param segments: The parts of the voice message
+        :param output_path: Path of the file without the extension
+        :param lang: The language of the text
+        """
+        last_error = None
+        for engine in self._engines_to_try():
+            try:
+                synthesize = self._timed(engine)
+                path = f"{output_path}.{engine.extension}"
+                clips = []
+                try:
+                    if engine.extension == "mp3":
+                        for segment in segments:
+                            clips.append(
+                                self.cache.get_or_create(
+                                    segment, lang, engine.name, synthesize
+                                )
+                            )
+                        return join_clips(clips, path)
+                    # Other formats can't be joined, so the whole message is a single clip
+                    clips.append(
+                        self.cache.get_or_create(
+                            " ".join(segments),
+                            lang,
+                            engine.name,
+                            synthesize,
+                            engine.extension,
+                        )
+                    )
+                    shutil.copyfile(clips[0], path)
+                    return path
+                finally:
+                    self.cache.release(clips)
+            except Exception as E:
+                last_error = E
+                with self._lock:
+                    self._failed_at[engine.name] = time()
+                    self.stats[engine.name]["failures"] += 1
+                print(
+                    f"[*] TTS: The '{engine.name}' engine failed ({E}), trying the next engine..."
+                )
+        raise RuntimeError(
+            f"No synthesis engine could make the voice message: {last_error}"
+        )
+
+    def latency_stats(self):
+        """
+        Returns the number of clips, failures and the average and last latency (in seconds) of every engine
+        """
+        with self._lock:
+            return {
+                name: {
+                    "clips": stats["clips"],
+                    "failures": stats["failures"],
+                    "avg_latency": (
+                        (stats["total_latency"] / stats["clips"])
+                        if stats["clips"]
+                        else None
+                    ),
+                    "last_latency": stats["last_latency"],
+                }
+                for name, stats in self.stats.items()
+            }
+
+
+def get_engines(names: list):
+    """
+    Returns the objects of the chosen synthesis engines
+    :param names: The names of the engines, in the order they should be tried
+    """
+    for name in names:
+        if name not in ENGINES:
+            raise ValueError(
+                f"Invalid synthesis engine, please choose from the list: {list(ENGINES.keys())}"
+            )
+    return [ENGINES[name]() for name in names]